@@ -0,0 +1,15 @@
+from .models import (
+    FanSpeedEnum, VerticalModeEnum, HorizontalModeEnum, CommandPriorityEnum,
+    AirPumpRequest, AirPumpState
+)
+from .transmit_queue import TransmitQueue, TransmitQueueFull, Priority
+from .presets import UnknownPreset
+from .thermal_model import ThermalModelDisabled
+from .controller import AirPumpController
+from .remote import RemoteAirPumpController
+
+__all__ = [
+    'FanSpeedEnum', 'VerticalModeEnum', 'HorizontalModeEnum', 'CommandPriorityEnum',
+    'AirPumpRequest', 'AirPumpState', 'TransmitQueue', 'TransmitQueueFull', 'Priority',
+    'UnknownPreset', 'ThermalModelDisabled', 'AirPumpController', 'RemoteAirPumpController'
+]
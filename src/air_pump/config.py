@@ -0,0 +1,115 @@
+import os
+import re
+import yaml
+from typing import Dict, Any, Optional
+from .presets import load_presets
+
+# config.yaml lives in the repository root, next to the src directory
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "config.yaml")
+
+# Settings that are only read at startup; changing them needs a restart
+RESTART_REQUIRED = (
+    ("transmitter", "mode"),
+    ("transmitter", "socket_path"),
+    ("transmitter", "frame_table"),
+    ("control",),
+    ("mqtt",),
+    ("config_reload",),
+    ("thermal_model",),
+)
+
+def load_config(config_path: Optional[str] = None) -> Dict[str, Any]:
+    """Load and validate configuration from YAML file."""
+    if config_path is None:
+        config_path = DEFAULT_CONFIG_PATH
+
+    try:
+        with open(config_path, 'r') as f:
+            config = yaml.safe_load(f)
+        validate_config(config)
+        return config
+    except Exception as e:
+        raise RuntimeError(f"Error loading configuration: {str(e)}")
+
+def _check(condition, message):
+    if not condition:
+        raise ValueError(message)
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def validate_config(config: Dict[str, Any]) -> None:
+    """Raise ValueError if a setting has an invalid type or value."""
+    _check(isinstance(config, dict), "configuration must be a mapping")
+    gpio = config.get("gpio")
+    _check(isinstance(gpio, dict) and isinstance(gpio.get("pin"), int) and 0 <= gpio["pin"] <= 53,
+           "gpio.pin must be a BCM GPIO number (0-53)")
+
+    sensor = config.get("temperature_sensor", {})
+    _check(isinstance(sensor, dict), "temperature_sensor must be a mapping")
+    _check(isinstance(sensor.get("enabled", True), bool), "temperature_sensor.enabled must be true or false")
+    _check(isinstance(sensor.get("device_path", ""), str), "temperature_sensor.device_path must be a path")
+    refresh_interval = sensor.get("refresh_interval", 60)
+    _check(_is_number(refresh_interval) and refresh_interval >= 0,
+           "temperature_sensor.refresh_interval must be a number of seconds >= 0")
+    _check(sensor.get("resolution", "auto") in ("auto", None, 9, 10, 11, 12),
+           "temperature_sensor.resolution must be 9-12, auto or null")
+
+    cors = config.get("cors", {})
+    _check(isinstance(cors, dict), "cors must be a mapping")
+    for name in ("allow_origins", "allow_methods", "allow_headers"):
+        values = cors.get(name, ["*"])
+        _check(isinstance(values, list) and all(isinstance(v, str) for v in values), f"cors.{name} must be a list of strings")
+    if cors.get("allow_origin_regex") is not None:
+        try:
+            re.compile(cors["allow_origin_regex"])
+        except (re.error, TypeError) as e:
+            raise ValueError(f"cors.allow_origin_regex is not a valid regex: {str(e)}")
+
+    transmitter = config.get("transmitter", {})
+    _check(isinstance(transmitter, dict), "transmitter must be a mapping")
+    _check(transmitter.get("mode", "local") in ("local", "daemon"), "transmitter.mode must be local or daemon")
+    queue_max_depth = transmitter.get("queue_max_depth", 8)
+    _check(isinstance(queue_max_depth, int) and queue_max_depth >= 1, "transmitter.queue_max_depth must be >= 1")
+    max_duty_cycle = transmitter.get("max_duty_cycle", 0.1)
+    _check(_is_number(max_duty_cycle) and 0 < max_duty_cycle <= 1, "transmitter.max_duty_cycle must be in (0, 1]")
+    duty_cycle_window = transmitter.get("duty_cycle_window", 60)
+    _check(_is_number(duty_cycle_window) and duty_cycle_window > 0, "transmitter.duty_cycle_window must be > 0")
+    wait_timeout = transmitter.get("wait_timeout", 10)
+    _check(_is_number(wait_timeout) and wait_timeout > 0, "transmitter.wait_timeout must be a number of seconds > 0")
+
+    load_presets(config.get("presets", {}))
+
+    readiness = config.get("readiness", {})
+    _check(isinstance(readiness, dict), "readiness must be a mapping")
+    for name, value in readiness.items():
+        _check(value is None or (_is_number(value) and value >= 0), f"readiness.{name} must be a number or null")
+
+    thermal_model = config.get("thermal_model", {})
+    _check(isinstance(thermal_model, dict), "thermal_model must be a mapping")
+    _check(isinstance(thermal_model.get("enabled", False), bool), "thermal_model.enabled must be true or false")
+    _check(isinstance(thermal_model.get("path") or "", str), "thermal_model.path must be a path")
+    for name in ("sample_interval", "settle_time"):
+        value = thermal_model.get(name, 300)
+        _check(_is_number(value) and value > 0, f"thermal_model.{name} must be a number of seconds > 0")
+    forgetting_factor = thermal_model.get("forgetting_factor", 0.995)
+    _check(_is_number(forgetting_factor) and 0.9 <= forgetting_factor <= 1,
+           "thermal_model.forgetting_factor must be in [0.9, 1]")
+    tolerance = thermal_model.get("tolerance", 0.5)
+    _check(_is_number(tolerance) and tolerance >= 0, "thermal_model.tolerance must be a number >= 0")
+
+    profiling = config.get("profiling", {})
+    _check(isinstance(profiling, dict), "profiling must be a mapping")
+    _check(isinstance(profiling.get("enabled", False), bool), "profiling.enabled must be true or false")
+    interval = profiling.get("interval", 0.005)
+    _check(_is_number(interval) and 0 < interval <= 1, "profiling.interval must be a number of seconds in (0, 1]")
+
+def restart_required_changes(old: Dict[str, Any], new: Dict[str, Any]) -> list:
+    """Names of the changed settings that only take effect after a restart."""
+    def lookup(config, path):
+        for key in path:
+            if not isinstance(config, dict):
+                return None
+            config = config.get(key)
+        return config
+    return [".".join(path) for path in RESTART_REQUIRED if lookup(old, path) != lookup(new, path)]
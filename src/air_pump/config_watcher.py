@@ -0,0 +1,149 @@
+"""
+Watches config.yaml and hands validated changes to a callback.
+
+Uses inotify (through libc, no extra dependency) on the directory holding the
+file, so both in-place writes and editors that replace the file are seen. If
+inotify is unavailable, the file's modification time is polled instead. A
+changed file that fails to load or validate is logged and ignored; the
+running configuration stays in effect.
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+from .config import load_config
+
+logger = logging.getLogger(__name__)
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")
+
+# Further events within this many seconds are folded into one reload
+DEBOUNCE = 0.2
+
+def _inotify_watch(directory):
+    """Return an inotify descriptor watching directory, or None if unavailable."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+class ConfigWatcher:
+    def __init__(self, config_path, on_change, current=None, poll_interval=2.0):
+        """
+        Args:
+            config_path (str): Path to config.yaml
+            on_change (callable): Called with the new configuration after it validated
+            current (dict): Configuration in effect, unchanged files are not reported
+            poll_interval (float): Seconds between checks when inotify is unavailable
+        """
+        self.config_path = os.path.abspath(config_path)
+        self.on_change = on_change
+        self.current = current
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self.rejected = 0
+        self._stopped = threading.Event()
+        self._thread = None
+        self._fd = None
+
+    def start(self):
+        """Start watching in the background."""
+        self._fd = _inotify_watch(os.path.dirname(self.config_path))
+        if self._fd is None:
+            logger.info(f"inotify unavailable, polling {self.config_path} every {self.poll_interval} s")
+        self._thread = threading.Thread(target=self._run, name="config-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _mtime(self):
+        try:
+            return os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _config_touched(self, data):
+        """Whether a buffer of inotify events mentions the config file."""
+        name = os.path.basename(self.config_path)
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            if data[offset:offset + length].rstrip(b"\0").decode(errors="replace") == name:
+                return True
+            offset += length
+        return False
+
+    def _wait_for_change(self, mtime):
+        """Block until the file may have changed (or the watcher is stopped)."""
+        while not self._stopped.is_set():
+            if self._fd is None:
+                self._stopped.wait(self.poll_interval)
+                if self._mtime() != mtime:
+                    return
+                continue
+            # Wake up regularly to notice stop()
+            if select.select([self._fd], [], [], 1.0)[0] and self._config_touched(os.read(self._fd, 4096)):
+                # Let the writer finish, then drain the events it caused
+                self._stopped.wait(DEBOUNCE)
+                while select.select([self._fd], [], [], 0)[0]:
+                    os.read(self._fd, 4096)
+                return
+
+    def check(self):
+        """Reload the file now, calling on_change if it changed and is valid."""
+        try:
+            config = load_config(self.config_path)
+        except RuntimeError as e:
+            self.rejected += 1
+            logger.error(f"Ignoring invalid configuration change: {str(e)}")
+            return
+        if config == self.current:
+            return
+        try:
+            self.on_change(config)
+        except Exception as e:
+            self.rejected += 1
+            logger.error(f"Failed to apply configuration change: {str(e)}")
+            return
+        self.current = config
+        self.reloads += 1
+        logger.info(f"Configuration reloaded from {self.config_path}")
+
+    def _run(self):
+        mtime = self._mtime()
+        while not self._stopped.is_set():
+            self._wait_for_change(mtime)
+            # Taken before loading, so a write during the reload is not missed
+            mtime = self._mtime()
+            if not self._stopped.is_set():
+                self.check()
+
+def start_watcher(config, config_path, on_change):
+    """Start a ConfigWatcher if enabled in config.yaml, returning it (or None)."""
+    reload_config = config.get("config_reload", {})
+    if not reload_config.get("enabled", True):
+        return None
+    watcher = ConfigWatcher(config_path, on_change, current=config,
+                            poll_interval=reload_config.get("poll_interval", 2))
+    watcher.start()
+    return watcher
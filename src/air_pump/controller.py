@@ -0,0 +1,337 @@
+import logging
+import threading
+from clock import SYSTEM_CLOCK
+from ir_sender.ir_sender import LogLevel, memory_stats
+from ir_sender.frame_table import FrameTable
+from ir_sender.mitsubishi import (
+    Mitsubishi, ClimateMode, FanMode, VanneVerticalMode, VanneHorizontalMode,
+    ISeeMode, AreaMode, PowerfulMode
+)
+from .transmit_queue import TransmitQueue, TransmitTimeout, Priority
+from .presets import PresetCache, UnknownPreset, load_presets
+from .thermal_model import ThermalModel, ThermalModelDisabled
+from .models import (
+    FanSpeedEnum, VerticalModeEnum, HorizontalModeEnum, AirPumpRequest, AirPumpState, CLIMATE_MODE_CHOICES
+)
+
+# Map enum values to IR sender constants
+FAN_SPEED_MAP = {
+    FanSpeedEnum.LOW: FanMode.Speed1,
+    FanSpeedEnum.MED: FanMode.Speed2,
+    FanSpeedEnum.HIGH: FanMode.Speed3,
+    FanSpeedEnum.AUTO: FanMode.Auto
+}
+
+VERTICAL_MODE_MAP = {
+    VerticalModeEnum.AUTO: VanneVerticalMode.Auto,
+    VerticalModeEnum.TOP: VanneVerticalMode.Top,
+    VerticalModeEnum.MIDDLE_TOP: VanneVerticalMode.MiddleTop,
+    VerticalModeEnum.MIDDLE: VanneVerticalMode.Middle,
+    VerticalModeEnum.MIDDLE_BOTTOM: VanneVerticalMode.MiddleBottom,
+    VerticalModeEnum.BOTTOM: VanneVerticalMode.Bottom,
+    VerticalModeEnum.SWING: VanneVerticalMode.Swing
+}
+
+HORIZONTAL_MODE_MAP = {
+    HorizontalModeEnum.NOT_SET: VanneHorizontalMode.NotSet,
+    HorizontalModeEnum.LEFT: VanneHorizontalMode.Left,
+    HorizontalModeEnum.MIDDLE_LEFT: VanneHorizontalMode.MiddleLeft,
+    HorizontalModeEnum.MIDDLE: VanneHorizontalMode.Middle,
+    HorizontalModeEnum.MIDDLE_RIGHT: VanneHorizontalMode.MiddleRight,
+    HorizontalModeEnum.RIGHT: VanneHorizontalMode.Right,
+    HorizontalModeEnum.SWING: VanneHorizontalMode.Swing
+}
+
+# Climate mode names as used in AirPumpState.mode and the transmitter protocol
+CLIMATE_MODE_NAMES = {
+    ClimateMode.Cold: "cool",
+    ClimateMode.Hot: "heat"
+}
+
+CLIMATE_MODES = {name: mode for mode, name in CLIMATE_MODE_NAMES.items()}
+
+logger = logging.getLogger(__name__)
+
+def load_frame_table(path):
+    """Open the precomputed frame table, or return None to encode frames on the fly."""
+    if not path:
+        return None
+    try:
+        return FrameTable(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Frame table unavailable, encoding frames on the fly: {str(e)}")
+        return None
+
+class AirPumpController:
+    """Owns the IR transmitter and tracks the state of the air pump."""
+
+    def __init__(self, gpio_pin, temperature_sensor=None, transmit_queue=None, frame_table=None, clock=None, pigpio=None, presets=None, thermal_model=None):
+        self.gpio_pin = gpio_pin
+        self.clock = clock or SYSTEM_CLOCK
+        # pigpio replaces libpigpio.so, e.g. with ir_sender.capture.CapturingPigpio
+        self.controller = Mitsubishi(self.gpio_pin, LogLevel.ErrorsOnly, frame_table, pigpio, self.clock.now)
+        self.temperature_sensor = temperature_sensor
+        # All transmissions go through one priority queue, the IR LED is a serial resource
+        self.transmit_queue = transmit_queue if transmit_queue is not None else TransmitQueue(clock=self.clock)
+        # Initialize state tracking
+        self._state = AirPumpState()
+        self._state.last_updated = self.clock.now().isoformat()
+        # Pulse trains of the configured presets, compiled ahead of time
+        self.presets = PresetCache(presets or {}, self._compile_preset, self.clock)
+        # Learns how fast the room heats and cools, None when disabled
+        self.thermal_model = thermal_model
+        # Transmission health counters, updated by the transmit worker and by
+        # callers whose transmission timed out
+        self._health_lock = threading.Lock()
+        self._sends = 0
+        self._send_failures = 0
+        self._send_failure_streak = 0
+        self._last_send_error = None
+        self._last_send_latency = None
+        self._last_send_finished = None
+
+    @classmethod
+    def from_config(cls, config, temperature_sensor=None, clock=None):
+        """Create a controller from config.yaml"""
+        transmitter_config = config.get("transmitter", {})
+        model_config = config.get("thermal_model", {})
+        thermal_model = None
+        if model_config.get("enabled", False) and temperature_sensor is not None:
+            thermal_model = ThermalModel.from_config(model_config, clock)
+        controller = cls(
+            config['gpio']['pin'],
+            temperature_sensor,
+            TransmitQueue.from_config(transmitter_config, clock),
+            load_frame_table(transmitter_config.get("frame_table")),
+            clock,
+            presets=load_presets(config.get("presets", {})),
+            thermal_model=thermal_model
+        )
+        controller.presets.start()
+        if thermal_model is not None:
+            thermal_model.start(controller.get_room_temperature)
+        return controller
+
+    def reconfigure(self, config):
+        """Apply a changed config.yaml to the running controller, keeping the air pump state"""
+        presets = load_presets(config.get("presets", {}))
+        presets_changed = self.get_presets()["presets"] != {name: preset.describe() for name, preset in presets.items()}
+        pin = config['gpio']['pin']
+        if pin != self.gpio_pin:
+            logger.info(f"IR transmitter moved from GPIO {self.gpio_pin} to GPIO {pin}")
+            self.gpio_pin = pin
+            # Read when a transmission starts, one in progress finishes on the old pin
+            self.controller.gpio_pin = pin
+            presets_changed = True
+        # Compiled pulses embed the GPIO pin and the settings, compile them again
+        if presets_changed:
+            self.presets.reconfigure(presets)
+        self.transmit_queue.reconfigure(config.get("transmitter", {}))
+        if self.temperature_sensor is not None:
+            self.temperature_sensor.reconfigure(config.get("temperature_sensor", {}))
+
+    def close(self) -> None:
+        """Stop the background preset compilation and thermal model sampling, saving the model"""
+        self.presets.stop()
+        if self.thermal_model is not None:
+            self.thermal_model.stop()
+
+    def _transmit(self, priority, func):
+        """Run func on the transmit queue and wait for it to complete."""
+        submitted = self.clock.monotonic()
+        try:
+            return self.transmit_queue.run(priority, lambda: self._track_send(func, submitted), Mitsubishi.mark_time())
+        except TransmitTimeout as e:
+            # The worker is stuck in the send, count it so that readiness fails
+            self._record_send_failure(e)
+            raise
+
+    def _track_send(self, func, submitted):
+        """Run a transmission, updating the health counters."""
+        try:
+            result = func()
+        except Exception as e:
+            self._record_send_failure(e)
+            raise
+        else:
+            with self._health_lock:
+                self._send_failure_streak = 0
+            return result
+        finally:
+            self._sends += 1
+            self._last_send_finished = self.clock.monotonic()
+            self._last_send_latency = self._last_send_finished - submitted
+
+    def _record_send_failure(self, error):
+        with self._health_lock:
+            self._send_failures += 1
+            self._send_failure_streak += 1
+            self._last_send_error = str(error)
+
+    def turn_off(self) -> None:
+        # Power-off always has the highest priority
+        self._transmit(Priority.POWER_OFF, self._turn_off)
+
+    def _turn_off(self) -> None:
+        self.controller.power_off()
+        self._update_state_off()
+
+    def _update_state_off(self) -> None:
+        self._state.power = False
+        self._state.mode = "off"
+        self._state.last_updated = self.clock.now().isoformat()
+        if self.thermal_model is not None:
+            self.thermal_model.command("off", None)
+
+    def send_command(self, climate_mode, request: AirPumpRequest, priority=Priority.USER) -> None:
+        self._transmit(priority, lambda: self._send_command(climate_mode, request))
+
+    @staticmethod
+    def _command_settings(climate_mode, request: AirPumpRequest) -> dict:
+        """Mitsubishi.send_command arguments for a request"""
+        return dict(
+            climate_mode=climate_mode,
+            temperature=request.temperature,
+            fan_mode=FAN_SPEED_MAP[request.fan_speed],
+            vanne_vertical_mode=VERTICAL_MODE_MAP[request.vertical_mode],
+            vanne_horizontal_mode=HORIZONTAL_MODE_MAP[request.horizontal_mode],
+            isee_mode=ISeeMode.ISeeOff,
+            area_mode=AreaMode.Full,
+            powerful=PowerfulMode.PowerfulOff
+        )
+
+    def _send_command(self, climate_mode, request: AirPumpRequest) -> None:
+        self.controller.send_command(**self._command_settings(climate_mode, request))
+        self._update_state(climate_mode, request)
+
+    def activate_preset(self, name, priority=Priority.USER) -> None:
+        """Send a preset from config.yaml, using its precompiled pulses when up to date"""
+        preset = self.presets.presets.get(name)
+        if preset is None:
+            raise UnknownPreset(name)
+        if preset.request is None:
+            # Power-off always has the highest priority
+            priority = Priority.POWER_OFF
+        self._transmit(priority, lambda: self._activate_preset(preset))
+
+    def _activate_preset(self, preset) -> None:
+        wave = self.presets.get(preset.name)
+        if wave is None or wave.gpio_pin != self.gpio_pin:
+            wave = self._compile_preset(preset, self.clock.now())
+        self.controller.send_compiled(wave)
+        if preset.request is None:
+            self._update_state_off()
+        else:
+            self._update_state(CLIMATE_MODES[preset.mode], preset.request)
+
+    def _compile_preset(self, preset, now):
+        if preset.request is None:
+            return self.controller.compile_power_off(now)
+        return self.controller.compile_command(**self._command_settings(CLIMATE_MODES[preset.mode], preset.request), now=now)
+
+    def get_presets(self) -> dict:
+        """Configured presets and the statistics of their compiled pulses"""
+        return {
+            "presets": {name: preset.describe() for name, preset in self.presets.presets.items()},
+            "cache": self.presets.stats()
+        }
+
+    def _update_state(self, climate_mode, request: AirPumpRequest) -> None:
+        # Update state after sending command
+        self._state.power = True
+        self._state.mode = CLIMATE_MODE_NAMES.get(climate_mode, "heat")
+        self._state.temperature = request.temperature
+        self._state.fan_speed = request.fan_speed
+        self._state.vertical_mode = request.vertical_mode
+        self._state.horizontal_mode = request.horizontal_mode
+        self._state.last_updated = self.clock.now().isoformat()
+        if self.thermal_model is not None:
+            self.thermal_model.command(self._state.mode, request.temperature)
+
+    def get_state(self) -> AirPumpState:
+        return self._state
+
+    def get_queue_stats(self) -> dict:
+        """Transmit queue depth, wait times and duty-cycle usage"""
+        return self.transmit_queue.stats()
+
+    def get_memory_stats(self) -> dict:
+        """Process RSS and pulse buffer pool statistics of the transmitter"""
+        return memory_stats()
+
+    def get_health(self) -> dict:
+        """Transmitter, queue and sensor health from counters, without touching the hardware"""
+        if self._sends == 0:
+            status = "idle"
+        elif self._send_failure_streak:
+            status = "failing"
+        else:
+            status = "ok"
+        last_send_age = None
+        if self._last_send_finished is not None:
+            last_send_age = round(self.clock.monotonic() - self._last_send_finished, 3)
+        return {
+            "transmitter": {
+                "status": status,
+                "sends": self._sends,
+                "failures": self._send_failures,
+                "failure_streak": self._send_failure_streak,
+                "last_error": self._last_send_error,
+                "last_send_latency_seconds": None if self._last_send_latency is None else round(self._last_send_latency, 4),
+                "last_send_age_seconds": last_send_age
+            },
+            "queue": {
+                "depth": self.transmit_queue.depth(),
+                "max_depth": self.transmit_queue.max_depth
+            },
+            "sensor": self.temperature_sensor.health() if self.temperature_sensor is not None else {"enabled": False}
+        }
+
+    def get_room_temperature(self):
+        """Get the current room temperature from the sensor"""
+        if self.temperature_sensor is None:
+            return None
+        temperature = self.temperature_sensor.read_temperature()
+        if temperature is not None and self.thermal_model is not None:
+            # The reading may come from the sensor cache, the model needs when it was taken
+            self.thermal_model.observe(*self.temperature_sensor.last_sample())
+        return temperature
+
+    def get_cached_room_temperature(self):
+        """The last room temperature read from the sensor, without reading it"""
+        if not self.sensor_enabled():
+            return None
+        return self.temperature_sensor.last_reading
+
+    def get_thermal_prediction(self, mode=None, setpoint=None) -> dict:
+        """
+        Predict the minutes for the room to reach a setpoint, from the thermal model
+
+        Args:
+            mode (str): heat or cool, defaults to the current mode
+            setpoint (int): Target temperature, defaults to the current setting
+        """
+        if self.thermal_model is None:
+            raise ThermalModelDisabled()
+        if mode is None:
+            mode = self._state.mode
+        if setpoint is None:
+            setpoint = self._state.temperature
+        if mode not in CLIMATE_MODES or setpoint is None:
+            if self._state.mode in CLIMATE_MODES:
+                raise ValueError(f"mode must be one of: {', '.join(CLIMATE_MODES)}")
+            raise ValueError("mode (heat or cool) and setpoint are required while the air pump is off")
+        temperature = self.get_room_temperature()
+        if temperature is None:
+            raise RuntimeError("Temperature sensor reading failed")
+        return {
+            "mode": mode,
+            "setpoint": setpoint,
+            "temperature": round(temperature, 2),
+            **self.thermal_model.predict(mode, setpoint, temperature),
+            "model": self.thermal_model.describe()
+        }
+
+    def sensor_enabled(self) -> bool:
+        """Whether a temperature sensor is configured and enabled"""
+        return self.temperature_sensor is not None and self.temperature_sensor.enabled
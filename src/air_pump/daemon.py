@@ -0,0 +1,103 @@
+"""
+Transmitter daemon: the single process that owns the GPIO pin and libpigpio.
+
+API workers (any number of uvicorn processes) talk to it over a Unix domain
+socket using the line protocol in `air_pump.protocol`, so the air pump state
+and the IR hardware are shared instead of duplicated per worker.
+
+Run with:
+    python -m air_pump [--config ../config.yaml]
+"""
+import argparse
+import logging
+import os
+import socketserver
+import threading
+from sensors.temperature_sensor import TemperatureSensor
+from .config import load_config, restart_required_changes, DEFAULT_CONFIG_PATH
+from .config_watcher import start_watcher
+from .controller import AirPumpController
+from .mqtt_bridge import start_bridge, stop_bridge
+from . import protocol
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = "/run/mitsubishi-ilp/transmitter.sock"
+DEFAULT_CONTROL_SOCKET_PATH = "/run/mitsubishi-ilp/control.sock"
+
+class _TransmitterHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline(protocol.MAX_MESSAGE_SIZE)
+            if not line:
+                return
+            response = protocol.handle_line(self.server.controller, line)
+            self.wfile.write(response)
+
+class TransmitterServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves an AirPumpController over a Unix domain socket."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, controller, socket_mode=0o660):
+        # Transmissions are serialised by the controller's transmit queue
+        self.controller = controller
+        self.socket_path = socket_path
+        os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _TransmitterHandler)
+        os.chmod(socket_path, socket_mode)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+def transmitter_socket_path(config) -> str:
+    """Return the transmitter socket path configured in config.yaml."""
+    return config.get("transmitter", {}).get("socket_path", DEFAULT_SOCKET_PATH)
+
+def control_socket_path(config) -> str:
+    """Return the local control socket path configured in config.yaml."""
+    return config.get("control", {}).get("socket_path", DEFAULT_CONTROL_SOCKET_PATH)
+
+def start_server(socket_path, controller) -> TransmitterServer:
+    """Serve a controller on socket_path from a background thread."""
+    server = TransmitterServer(socket_path, controller)
+    threading.Thread(target=server.serve_forever, name="control-socket", daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mitsubishi ILP IR transmitter daemon")
+    parser.add_argument("--config", default=None, help="Path to config.yaml")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    config = load_config(args.config)
+    controller = AirPumpController.from_config(
+        config,
+        TemperatureSensor.from_config(config.get("temperature_sensor", {}))
+    )
+    socket_path = transmitter_socket_path(config)
+    server = TransmitterServer(socket_path, controller)
+    logger.info(f"Transmitter daemon listening on {socket_path}")
+    mqtt_bridge = start_bridge(config, controller)
+
+    def apply_config(new_config):
+        for name in restart_required_changes(watcher.current, new_config):
+            logger.warning(f"Configuration change of {name} takes effect after a restart")
+        controller.reconfigure(new_config)
+
+    watcher = start_watcher(config, args.config or DEFAULT_CONFIG_PATH, apply_config)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        if mqtt_bridge is not None:
+            stop_bridge(mqtt_bridge)
+        server.server_close()
+        controller.close()
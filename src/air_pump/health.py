@@ -0,0 +1,43 @@
+"""
+Readiness evaluation from the controller's health counters.
+
+The counters are maintained incrementally by the transmit worker and the
+temperature sensor, so evaluating readiness never touches the hardware and
+can be polled at high frequency by watchdogs.
+"""
+
+def evaluate_readiness(health, readiness_config=None):
+    """
+    Check health counters against the `readiness` section of config.yaml.
+
+    Args:
+        health (dict): Result of AirPumpController.get_health()
+        readiness_config (dict): Thresholds, see config.yaml
+
+    Returns:
+        list: Reasons for not being ready, empty when ready
+    """
+    readiness_config = readiness_config or {}
+    reasons = []
+
+    transmitter = health["transmitter"]
+    max_send_failures = readiness_config.get("max_send_failure_streak", 3)
+    if max_send_failures is not None and transmitter["failure_streak"] >= max_send_failures:
+        reasons.append(f"{transmitter['failure_streak']} consecutive transmissions failed: {transmitter['last_error']}")
+
+    queue = health["queue"]
+    max_queue_depth = readiness_config.get("max_queue_depth") or queue["max_depth"]
+    if queue["depth"] >= max_queue_depth:
+        reasons.append(f"Transmit queue is backed up ({queue['depth']} commands waiting)")
+
+    sensor = health["sensor"]
+    if sensor["enabled"]:
+        max_sensor_failures = readiness_config.get("max_sensor_failure_streak", 3)
+        if max_sensor_failures is not None and sensor["failure_streak"] >= max_sensor_failures:
+            reasons.append(f"{sensor['failure_streak']} consecutive temperature readings failed")
+        # The sensor is read on demand, so a stale sample is only a problem if configured
+        max_sensor_age = readiness_config.get("max_sensor_age")
+        if max_sensor_age is not None and (sensor["sample_age_seconds"] is None or sensor["sample_age_seconds"] > max_sensor_age):
+            reasons.append("No recent temperature reading")
+
+    return reasons
@@ -0,0 +1,58 @@
+from typing import Optional
+from enum import Enum
+from pydantic import BaseModel, Field, validator
+
+# Define enums for cleaner API interfaces
+class FanSpeedEnum(str, Enum):
+    LOW = "low"
+    MED = "med"
+    HIGH = "high"
+    AUTO = "auto"
+
+class VerticalModeEnum(str, Enum):
+    AUTO = "auto"
+    TOP = "top"
+    MIDDLE_TOP = "middle_top"
+    MIDDLE = "middle"
+    MIDDLE_BOTTOM = "middle_bottom"
+    BOTTOM = "bottom"
+    SWING = "swing"
+
+class HorizontalModeEnum(str, Enum):
+    NOT_SET = "not_set"
+    LEFT = "left"
+    MIDDLE_LEFT = "middle_left"
+    MIDDLE = "middle"
+    MIDDLE_RIGHT = "middle_right"
+    RIGHT = "right"
+    SWING = "swing"
+
+# Climate mode names used by the API, presets and the control protocol; the
+# controller maps them to IR constants (controller.CLIMATE_MODES)
+CLIMATE_MODE_CHOICES = ("cool", "heat")
+
+class CommandPriorityEnum(str, Enum):
+    USER = "user"
+    AUTOMATION = "automation"
+
+# Define request and state models
+class AirPumpRequest(BaseModel):
+    temperature: int = Field(..., ge=16, le=31, description="Temperature setting (16-31°C)")
+    fan_speed: FanSpeedEnum = Field(FanSpeedEnum.AUTO, description="Fan speed setting")
+    vertical_mode: VerticalModeEnum = Field(VerticalModeEnum.MIDDLE, description="Vertical vane position")
+    horizontal_mode: HorizontalModeEnum = Field(HorizontalModeEnum.MIDDLE, description="Horizontal vane position")
+
+    @validator('temperature')
+    def validate_temperature(cls, v):
+        if v < 16 or v > 31:
+            raise ValueError('Temperature must be between 16 and 31')
+        return v
+
+class AirPumpState(BaseModel):
+    power: bool = Field(False, description="Power state (on/off)")
+    mode: Optional[str] = Field(None, description="Current mode (cool/heat/off)")
+    temperature: Optional[int] = Field(None, description="Temperature setting (16-31°C)")
+    fan_speed: Optional[FanSpeedEnum] = Field(None, description="Fan speed setting")
+    vertical_mode: Optional[VerticalModeEnum] = Field(None, description="Vertical vane position")
+    horizontal_mode: Optional[HorizontalModeEnum] = Field(None, description="Horizontal vane position")
+    last_updated: Optional[str] = Field(None, description="Last updated timestamp")
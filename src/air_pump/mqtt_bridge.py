@@ -0,0 +1,188 @@
+"""
+MQTT bridge for home-automation integration.
+
+Subscribes to command topics and forwards them to the controller, and
+publishes the air pump state and room temperature as retained messages, only
+when they change. Changes are collected every `publish_interval` seconds and
+published together over the one persistent connection. The temperature is
+published from the sensor's cached reading; the bridge itself only reads the
+sensor every `temperature_interval` seconds.
+
+Topics (with the default prefix):
+    mitsubishi_ilp/command/heat         AirPumpRequest JSON, e.g. {"temperature": 22}
+    mitsubishi_ilp/command/cool         AirPumpRequest JSON
+    mitsubishi_ilp/command/off          any payload
+    mitsubishi_ilp/command/preset       preset name from config.yaml
+    mitsubishi_ilp/state                retained AirPumpState JSON
+    mitsubishi_ilp/room_temperature     retained temperature in °C
+    mitsubishi_ilp/availability         retained "online"/"offline"
+
+Commands are sent with automation priority unless the payload carries
+"priority": "user". Requires the optional `paho-mqtt` package; the bridge
+itself only needs a client object with the paho publish/subscribe interface,
+so a broker stand-in can be injected for testing (see tools/mqtt_check.py).
+"""
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from clock import SYSTEM_CLOCK
+from .controller import CLIMATE_MODES
+from .models import AirPumpRequest
+from .transmit_queue import Priority, parse_command_priority
+
+logger = logging.getLogger(__name__)
+
+class MqttBridge:
+    def __init__(self, controller, client, topic_prefix="mitsubishi_ilp", publish_interval=1.0, temperature_interval=60.0, clock=None):
+        """
+        Args:
+            controller: AirPumpController of the process owning the transmitter
+            client: Connected MQTT client (paho.mqtt.client.Client interface)
+            topic_prefix (str): Prefix of all topics
+            publish_interval (float): Seconds between batches of publishes
+            temperature_interval (float): Seconds between the bridge's own sensor readings
+            clock (SystemClock): Clock for the sensor reading interval
+        """
+        self.controller = controller
+        self.client = client
+        self.topic_prefix = topic_prefix.rstrip("/")
+        self.publish_interval = publish_interval
+        self.temperature_interval = temperature_interval
+        self.clock = clock or SYSTEM_CLOCK
+        self._last_temperature_read = None
+        # Last payload published per topic, publishes are skipped when unchanged;
+        # only used by the publish thread
+        self._published = {}
+        # Set on (re)connection, the publish thread then publishes everything again
+        self._resync = threading.Event()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        # Commands block until transmitted, keep them off the network loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mqtt-command")
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+    def topic(self, name) -> str:
+        return f"{self.topic_prefix}/{name}"
+
+    def start(self):
+        """Start publishing changes in the background."""
+        self._thread = threading.Thread(target=self._run, name="mqtt-publish", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=False)
+        self.client.publish(self.topic("availability"), "offline", qos=1, retain=True)
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        client.subscribe(self.topic("command/+"), qos=1)
+        client.publish(self.topic("availability"), "online", qos=1, retain=True)
+        # The broker may have lost retained messages, publish everything again
+        self._resync.set()
+        self._wakeup.set()
+
+    def _on_message(self, client, userdata, message):
+        command = message.topic[len(self.topic("command/")):]
+        self._executor.submit(self._handle_command, command, message.payload)
+
+    def _handle_command(self, command, payload):
+        try:
+            if command == "off":
+                self.controller.turn_off()
+            elif command == "preset":
+                self.controller.activate_preset(payload.decode().strip(), Priority.AUTOMATION)
+            elif command in CLIMATE_MODES:
+                settings = json.loads(payload or b"{}")
+                priority = parse_command_priority(settings.pop("priority", "automation"))
+                self.controller.send_command(CLIMATE_MODES[command], AirPumpRequest(**settings), priority)
+            else:
+                raise ValueError(f"Unknown command: {command}")
+        except Exception as e:
+            logger.error(f"MQTT command {command} failed: {str(e)}")
+        self._wakeup.set()
+
+    def _collect(self) -> dict:
+        """Return the current payload of every published topic."""
+        payloads = {
+            self.topic("state"): json.dumps(self.controller.get_state().dict(), sort_keys=True)
+        }
+        now = self.clock.monotonic()
+        if self._last_temperature_read is None or now - self._last_temperature_read >= self.temperature_interval:
+            self._last_temperature_read = now
+            temperature = self.controller.get_room_temperature()
+        else:
+            # Whatever was read meanwhile (API, thermal model), without touching the sensor
+            temperature = self.controller.get_cached_room_temperature()
+        if temperature is not None:
+            payloads[self.topic("room_temperature")] = f"{temperature:.1f}"
+        return payloads
+
+    def publish_changes(self) -> int:
+        """Publish the topics whose payload changed, returning how many were published."""
+        if self._resync.is_set():
+            self._resync.clear()
+            self._published.clear()
+        changed = {topic: payload for topic, payload in self._collect().items()
+                   if self._published.get(topic) != payload}
+        for topic, payload in changed.items():
+            self.client.publish(topic, payload, qos=1, retain=True)
+        self._published.update(changed)
+        return len(changed)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            # Wait for a command or the next interval; all changes found are
+            # then published together
+            self._wakeup.wait(self.publish_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                self.publish_changes()
+            except Exception as e:
+                logger.error(f"MQTT publish failed: {str(e)}")
+
+def create_client(mqtt_config):
+    """Create and connect a paho MQTT client from the `mqtt` section of config.yaml."""
+    try:
+        import paho.mqtt.client as mqtt
+    except ImportError:
+        raise RuntimeError("MQTT is enabled but paho-mqtt is not installed (pip install paho-mqtt)")
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=mqtt_config.get("client_id", "mitsubishi-ilp"))
+    if mqtt_config.get("username"):
+        client.username_pw_set(mqtt_config["username"], mqtt_config.get("password") or None)
+    prefix = mqtt_config.get("topic_prefix", "mitsubishi_ilp").rstrip("/")
+    client.will_set(f"{prefix}/availability", "offline", qos=1, retain=True)
+    client.connect_async(mqtt_config.get("host", "localhost"), mqtt_config.get("port", 1883),
+                         keepalive=mqtt_config.get("keepalive", 60))
+    return client
+
+def start_bridge(config, controller):
+    """Start the MQTT bridge if enabled in config.yaml, returning it (or None)."""
+    mqtt_config = config.get("mqtt", {})
+    if not mqtt_config.get("enabled", False):
+        return None
+    client = create_client(mqtt_config)
+    bridge = MqttBridge(
+        controller,
+        client,
+        topic_prefix=mqtt_config.get("topic_prefix", "mitsubishi_ilp"),
+        publish_interval=mqtt_config.get("publish_interval", 1),
+        temperature_interval=mqtt_config.get("temperature_interval", 60)
+    )
+    client.loop_start()
+    bridge.start()
+    return bridge
+
+def stop_bridge(bridge):
+    """Stop a bridge returned by start_bridge."""
+    bridge.stop()
+    bridge.client.disconnect()
+    bridge.client.loop_stop()
@@ -0,0 +1,155 @@
+"""
+Named presets (scenes) from the `presets` section of config.yaml.
+
+Activating a preset sends a fixed set of settings, so its pulse train can be
+compiled ahead of time. The only part of a frame that changes over the day is
+the Clock byte, which advances every ten minutes; PresetCache keeps the
+pulses of every preset compiled for the current and the next Clock slot and
+compiles the slot after that in the background when a slot rolls over. An
+activation then costs only the hardware send.
+"""
+import logging
+import threading
+from datetime import timedelta
+from pydantic import ValidationError
+from .models import AirPumpRequest, CLIMATE_MODE_CHOICES
+
+logger = logging.getLogger(__name__)
+
+# Length of a Mitsubishi Clock slot
+SLOT = timedelta(minutes=10)
+
+class UnknownPreset(LookupError):
+    """Raised when activating a preset that is not configured."""
+
+    def __init__(self, name):
+        super().__init__(f"Unknown preset: {name}")
+        self.name = name
+
+class Preset:
+    """A named set of air pump settings; mode is "off" and request None for a power-off preset."""
+
+    def __init__(self, name, mode="off", request=None):
+        self.name = name
+        self.mode = mode
+        self.request = request
+
+    @classmethod
+    def from_config(cls, name, settings):
+        """Create a preset from one entry of the `presets` section of config.yaml"""
+        settings = dict(settings or {})
+        mode = settings.pop("mode", None)
+        # YAML reads an unquoted off as false
+        if mode == "off" or mode is False:
+            return cls(name)
+        if mode not in CLIMATE_MODE_CHOICES:
+            raise ValueError(f"presets.{name}.mode must be one of: off, {', '.join(CLIMATE_MODE_CHOICES)}")
+        try:
+            return cls(name, mode, AirPumpRequest(**settings))
+        except ValidationError as e:
+            raise ValueError(f"presets.{name}: {str(e)}")
+
+    def describe(self) -> dict:
+        if self.request is None:
+            return {"mode": self.mode}
+        return {"mode": self.mode, **self.request.dict()}
+
+def load_presets(presets_config) -> dict:
+    """Parse the `presets` section of config.yaml into a name -> Preset dict."""
+    if not isinstance(presets_config or {}, dict):
+        raise ValueError("presets must be a mapping of names to settings")
+    for name in presets_config or {}:
+        if not isinstance(name, str):
+            raise ValueError(f"presets: name {name!r} must be a string (quote names such as \"off\")")
+    return {name: Preset.from_config(name, settings) for name, settings in (presets_config or {}).items()}
+
+def slot_start(now):
+    """Start of the Clock slot containing now."""
+    return now.replace(minute=now.minute - now.minute % 10, second=0, microsecond=0)
+
+class PresetCache:
+    def __init__(self, presets, compile, clock):
+        """
+        Args:
+            presets (dict): name -> Preset
+            compile (callable): compile(preset, now) returns the CompiledWave of preset at time now
+            clock (SystemClock): Clock deciding the current slot
+        """
+        self.presets = presets
+        self.compile = compile
+        self.clock = clock
+        # (name, slot start) -> CompiledWave, replaced as a whole by refresh()
+        self._waves = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.compilations = 0
+
+    def start(self):
+        """Compile every preset and keep them up to date in the background."""
+        if self._thread is None and self.presets:
+            self._thread = threading.Thread(target=self._run, name="preset-cache", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def refresh(self, invalidate=False):
+        """Compile the presets for the current and next slot, dropping older slots; returns the current slot."""
+        with self._lock:
+            current = slot_start(self.clock.now())
+            previous = {} if invalidate else self._waves
+            waves = {}
+            for name, preset in self.presets.items():
+                for start in (current, current + SLOT):
+                    wave = previous.get((name, start))
+                    if wave is None:
+                        wave = self.compile(preset, start)
+                        self.compilations += 1
+                    waves[(name, start)] = wave
+            self._waves = waves
+            return current
+
+    def reconfigure(self, presets):
+        """Replace the preset definitions and recompile them (e.g. after a config or GPIO pin change)."""
+        self.presets = presets
+        if self._thread is None:
+            self.start()
+        else:
+            self.refresh(invalidate=True)
+
+    def get(self, name):
+        """Return the compiled wave of a preset for the current slot, or None if not compiled yet."""
+        wave = self._waves.get((name, slot_start(self.clock.now())))
+        if wave is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return wave
+
+    def stats(self) -> dict:
+        return {
+            "compiled": len(self._waves),
+            "hits": self.hits,
+            "misses": self.misses,
+            "compilations": self.compilations
+        }
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                current = self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to compile presets: {str(e)}")
+                current = slot_start(self.clock.now())
+            # Wake up just after the next slot starts; its pulses are ready by
+            # then, so the refresh only compiles the slot after it. If the slot
+            # rolled over while compiling, refresh again right away.
+            remaining = (current + SLOT - self.clock.now()).total_seconds() + 0.01
+            if remaining > 0:
+                self._stopped.wait(self.clock.timeout(remaining))
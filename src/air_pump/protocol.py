@@ -0,0 +1,144 @@
+"""
+Line protocol spoken between API workers, local scripts and the controller.
+
+Each message is a single JSON object terminated by a newline. Requests carry an
+`op` field; responses are either {"ok": true, "result": ...} or
+{"ok": false, "error": "..."}. Rejections by the transmit queue additionally
+carry "retry_after" (seconds), unknown presets "unknown_preset" (the name),
+predictions with the thermal model disabled "thermal_model_disabled": true and
+invalid requests "invalid": true.
+
+Operations:
+    off                                   power the air pump off
+    send     mode, settings[, priority]   send a cool/heat command (settings as AirPumpRequest,
+                                          priority "user" or "automation")
+    state                                 return the AirPumpState
+    queue                                 return the transmit queue statistics
+    memory                                return the transmitter memory statistics
+    preset   name[, priority]             send a preset from config.yaml
+    presets                               return the presets and their compilation statistics
+    health                                return the transmitter, queue and sensor health counters
+    room_temperature                      return {"temperature": float|null, "enabled": bool}
+    thermal_model [mode, setpoint]        predict the minutes to reach a setpoint (default: the
+                                          current mode and setting) from the learned thermal model
+
+For shell scripts, requests may also be written as plain words, e.g.
+    heat 22 fan=high vertical=top horizontal=middle priority=automation
+    preset night_heat priority=automation
+    thermal_model heat 22
+    off
+    state
+Responses are always JSON.
+"""
+import json
+from .controller import CLIMATE_MODES
+from .models import AirPumpRequest
+from .transmit_queue import TransmitQueueFull, parse_command_priority
+from .presets import UnknownPreset
+from .thermal_model import ThermalModelDisabled
+
+# Upper bound for a single message, protects the daemon from runaway clients
+MAX_MESSAGE_SIZE = 64 * 1024
+
+def encode(message) -> bytes:
+    """Serialise a message to a protocol line."""
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+# Short argument names accepted by the plain-word form of send
+_SETTING_NAMES = {
+    "fan": "fan_speed",
+    "vertical": "vertical_mode",
+    "horizontal": "horizontal_mode"
+}
+
+def decode(line: bytes):
+    """Parse a protocol line (JSON or plain words) into a message."""
+    line = line.strip()
+    if line.startswith(b"{"):
+        return json.loads(line)
+    words = line.decode().split()
+    if not words:
+        raise ValueError("Empty request")
+    op, args = words[0], words[1:]
+    if op == "preset":
+        if not args:
+            raise ValueError("Usage: preset NAME [priority=..]")
+        message = {"op": "preset", "name": args[0]}
+        for arg in args[1:]:
+            name, _, value = arg.partition("=")
+            if name != "priority":
+                raise ValueError(f"Unknown argument: {name}")
+            message["priority"] = value
+        return message
+    if op == "thermal_model":
+        if len(args) not in (0, 2):
+            raise ValueError("Usage: thermal_model [MODE SETPOINT]")
+        if not args:
+            return {"op": op}
+        return {"op": op, "mode": args[0], "setpoint": int(args[1])}
+    if op not in CLIMATE_MODES:
+        return {"op": op}
+    if not args:
+        raise ValueError(f"Usage: {op} TEMPERATURE [fan=..] [vertical=..] [horizontal=..] [priority=..]")
+    message = {"op": "send", "mode": op, "settings": {"temperature": int(args[0])}}
+    for arg in args[1:]:
+        name, _, value = arg.partition("=")
+        if name == "priority":
+            message["priority"] = value
+        elif name in _SETTING_NAMES:
+            message["settings"][_SETTING_NAMES[name]] = value
+        else:
+            raise ValueError(f"Unknown argument: {name}")
+    return message
+
+def execute(controller, message):
+    """Run a request message against a controller and return the result payload."""
+    op = message.get("op")
+    if op == "off":
+        controller.turn_off()
+        return None
+    if op == "send":
+        mode = message.get("mode")
+        if mode not in CLIMATE_MODES:
+            raise ValueError(f"Unknown mode: {mode}")
+        priority = parse_command_priority(message.get("priority", "user"))
+        controller.send_command(CLIMATE_MODES[mode], AirPumpRequest(**message.get("settings", {})), priority)
+        return None
+    if op == "preset":
+        priority = parse_command_priority(message.get("priority", "user"))
+        controller.activate_preset(message.get("name"), priority)
+        return None
+    if op == "presets":
+        return controller.get_presets()
+    if op == "state":
+        return controller.get_state().dict()
+    if op == "queue":
+        return controller.get_queue_stats()
+    if op == "memory":
+        return controller.get_memory_stats()
+    if op == "health":
+        return controller.get_health()
+    if op == "thermal_model":
+        return controller.get_thermal_prediction(message.get("mode"), message.get("setpoint"))
+    if op == "room_temperature":
+        return {
+            "temperature": controller.get_room_temperature(),
+            "enabled": controller.sensor_enabled()
+        }
+    raise ValueError(f"Unknown operation: {op}")
+
+def handle_line(controller, line: bytes) -> bytes:
+    """Handle one request line and return the response line."""
+    try:
+        result = execute(controller, decode(line))
+        return encode({"ok": True, "result": result})
+    except TransmitQueueFull as e:
+        return encode({"ok": False, "error": str(e), "retry_after": e.retry_after})
+    except UnknownPreset as e:
+        return encode({"ok": False, "error": str(e), "unknown_preset": e.name})
+    except ThermalModelDisabled as e:
+        return encode({"ok": False, "error": str(e), "thermal_model_disabled": True})
+    except ValueError as e:
+        return encode({"ok": False, "error": str(e), "invalid": True})
+    except Exception as e:
+        return encode({"ok": False, "error": str(e)})
@@ -0,0 +1,162 @@
+import json
+import socket
+import threading
+from .controller import CLIMATE_MODE_NAMES
+from .models import AirPumpRequest, AirPumpState
+from .transmit_queue import Priority, TransmitQueueFull
+from .presets import UnknownPreset
+from .thermal_model import ThermalModelDisabled
+from . import protocol
+
+class _Connection:
+    """One connection to the daemon, used by one thread at a time."""
+
+    def __init__(self, socket_path, timeout):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.settimeout(timeout)
+            self.sock.connect(socket_path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.rfile = self.sock.makefile("rb")
+
+    def roundtrip(self, line):
+        self.sock.sendall(line)
+        response = self.rfile.readline(protocol.MAX_MESSAGE_SIZE)
+        if not response:
+            raise ConnectionError("Transmitter daemon closed the connection")
+        if not response.endswith(b"\n"):
+            raise ValueError(f"Reply longer than {protocol.MAX_MESSAGE_SIZE} bytes")
+        return json.loads(response)
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+class RemoteAirPumpController:
+    """
+    AirPumpController stand-in that forwards every call to the transmitter daemon.
+
+    Calls from different threads run concurrently on connections taken from a
+    small pool, so a state or health request does not wait behind a command
+    being transmitted. A call on a pooled connection that turns out to be
+    stale (daemon restarted) is retried once on a fresh connection, for the
+    operations that are safe to repeat.
+    """
+
+    # Idle connections kept open for reuse
+    MAX_IDLE_CONNECTIONS = 4
+    # Operations without side effects on the air pump, safe to send twice
+    RETRY_SAFE_OPS = frozenset(("state", "queue", "memory", "health", "presets", "room_temperature", "thermal_model"))
+
+    def __init__(self, socket_path, timeout=30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle = []
+        self._sensor_enabled = None
+
+    def close(self):
+        """Close the idle connections; connections in use are closed when returned"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def _acquire(self):
+        """Return (connection, pooled), pooled telling whether it was reused."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return _Connection(self.socket_path, self.timeout), False
+
+    def _release(self, connection):
+        with self._lock:
+            if len(self._idle) < self.MAX_IDLE_CONNECTIONS:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    @staticmethod
+    def _roundtrip(connection, line):
+        """Send line on connection, closing it if the exchange fails in any way"""
+        try:
+            return connection.roundtrip(line)
+        except BaseException:
+            connection.close()
+            raise
+
+    def call(self, message):
+        """Send a request to the daemon and return its result payload."""
+        line = protocol.encode(message)
+        try:
+            connection, pooled = self._acquire()
+            try:
+                response = self._roundtrip(connection, line)
+            except OSError as e:
+                if not pooled or isinstance(e, socket.timeout) or message.get("op") not in self.RETRY_SAFE_OPS:
+                    raise
+                # Stale connection (daemon restarted), retry once on a fresh one
+                connection = _Connection(self.socket_path, self.timeout)
+                response = self._roundtrip(connection, line)
+            self._release(connection)
+        except OSError as e:
+            raise RuntimeError(f"Transmitter daemon unavailable at {self.socket_path}: {str(e)}")
+        except ValueError as e:
+            # A malformed or oversized reply, not a problem with the request
+            raise RuntimeError(f"Invalid reply from the transmitter daemon: {str(e)}")
+        if not response.get("ok"):
+            if "retry_after" in response:
+                raise TransmitQueueFull(response["retry_after"], response.get("error", "Transmit queue is full"))
+            if "unknown_preset" in response:
+                raise UnknownPreset(response["unknown_preset"])
+            if response.get("thermal_model_disabled"):
+                raise ThermalModelDisabled()
+            if response.get("invalid"):
+                raise ValueError(response.get("error", "Invalid request"))
+            raise RuntimeError(response.get("error", "Unknown transmitter error"))
+        return response.get("result")
+
+    def turn_off(self) -> None:
+        self.call({"op": "off"})
+
+    def send_command(self, climate_mode, request: AirPumpRequest, priority=Priority.USER) -> None:
+        self.call({
+            "op": "send",
+            "mode": CLIMATE_MODE_NAMES[climate_mode],
+            "settings": request.dict(),
+            "priority": priority.name.lower()
+        })
+
+    def activate_preset(self, name, priority=Priority.USER) -> None:
+        self.call({"op": "preset", "name": name, "priority": priority.name.lower()})
+
+    def get_presets(self) -> dict:
+        return self.call({"op": "presets"})
+
+    def get_state(self) -> AirPumpState:
+        return AirPumpState(**self.call({"op": "state"}))
+
+    def get_queue_stats(self) -> dict:
+        return self.call({"op": "queue"})
+
+    def get_memory_stats(self) -> dict:
+        return self.call({"op": "memory"})
+
+    def get_health(self) -> dict:
+        return self.call({"op": "health"})
+
+    def get_thermal_prediction(self, mode=None, setpoint=None) -> dict:
+        return self.call({"op": "thermal_model", "mode": mode, "setpoint": setpoint})
+
+    def get_room_temperature(self):
+        """Get the current room temperature from the daemon's sensor"""
+        result = self.call({"op": "room_temperature"})
+        self._sensor_enabled = result["enabled"]
+        return result["temperature"]
+
+    def sensor_enabled(self) -> bool:
+        if self._sensor_enabled is None:
+            self.get_room_temperature()
+        return self._sensor_enabled
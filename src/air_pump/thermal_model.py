@@ -0,0 +1,265 @@
+"""
+Online thermal model of the room, learned from temperature readings and the
+commands sent to the air pump.
+
+While the air pump heats or cools towards a setpoint S, the room temperature T
+is modelled as
+
+    dT/dt = k * (S - T) + c        (°C per hour)
+
+k being how fast the room follows the air pump and c the losses (or gains)
+to the outside. k and c are fitted per mode by recursive least squares with a
+forgetting factor, so the model follows the seasons: each reading costs a few
+multiplications, and the whole state is two 2x2 covariance matrices and four
+parameters, saved to a small JSON file.
+
+The equation solves to T(t) = E + (T0 - E) * exp(-k t) with the equilibrium
+E = S + c / k, which gives the time to reach the setpoint.
+"""
+import json
+import logging
+import math
+import os
+import threading
+from clock import SYSTEM_CLOCK
+
+logger = logging.getLogger(__name__)
+
+# Modes with a setpoint to model; readings while off are not used
+MODES = ("heat", "cool")
+# Updates needed before a mode makes predictions
+MIN_SAMPLES = 6
+# Initial covariance, large: nothing is known about the room yet
+INITIAL_COVARIANCE = 100.0
+# Covariance trace above which the forgetting factor is not applied, so that
+# the covariance does not blow up while the readings carry no information
+MAX_COVARIANCE_TRACE = 1000.0
+# Seconds of clock time between two saves of the model file
+SAVE_INTERVAL = 600
+FILE_VERSION = 1
+
+class ThermalModelDisabled(LookupError):
+    """Raised when asking for a prediction while the thermal model is disabled."""
+
+    def __init__(self):
+        super().__init__("Thermal model is disabled")
+
+class RecursiveLeastSquares:
+    """Two-parameter recursive least squares, y = theta . x"""
+
+    def __init__(self, theta=None, covariance=None, samples=0):
+        self.theta = list(theta or (0.0, 0.0))
+        self.covariance = [list(row) for row in (covariance or ((INITIAL_COVARIANCE, 0.0), (0.0, INITIAL_COVARIANCE)))]
+        self.samples = samples
+
+    def update(self, x, y, forgetting_factor):
+        (p00, p01), (p10, p11) = self.covariance
+        x0, x1 = x
+        # P x and the gain k = P x / (lambda + x' P x)
+        px0 = p00 * x0 + p01 * x1
+        px1 = p10 * x0 + p11 * x1
+        denominator = forgetting_factor + x0 * px0 + x1 * px1
+        k0 = px0 / denominator
+        k1 = px1 / denominator
+        error = y - (self.theta[0] * x0 + self.theta[1] * x1)
+        self.theta[0] += k0 * error
+        self.theta[1] += k1 * error
+        # P = (P - k x' P) / lambda, x' P = (P x)' as P is symmetric
+        scale = 1.0 if p00 + p11 > MAX_COVARIANCE_TRACE else forgetting_factor
+        self.covariance = [
+            [(p00 - k0 * px0) / scale, (p01 - k0 * px1) / scale],
+            [(p10 - k1 * px0) / scale, (p11 - k1 * px1) / scale]
+        ]
+        self.samples += 1
+
+    def to_dict(self) -> dict:
+        return {"theta": self.theta, "covariance": self.covariance, "samples": self.samples}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["theta"], data["covariance"], data["samples"])
+
+class ThermalModel:
+    def __init__(self, path=None, sample_interval=300, settle_time=300, forgetting_factor=0.995, tolerance=0.5, clock=None):
+        """
+        Args:
+            path (str): JSON file the model is saved to, None to keep it in memory
+            sample_interval (float): Seconds between the readings used for an update
+            settle_time (float): Seconds after a command during which readings are not used
+            forgetting_factor (float): Weight kept by past updates at each update (0-1]
+            tolerance (float): °C below (heat) or above (cool) the setpoint that counts as reached
+            clock (SystemClock): Clock of the temperature sensor, for the command times
+        """
+        self.path = path
+        self.sample_interval = sample_interval
+        self.settle_time = settle_time
+        self.forgetting_factor = forgetting_factor
+        self.tolerance = tolerance
+        self.clock = clock or SYSTEM_CLOCK
+        self.models = {mode: RecursiveLeastSquares() for mode in MODES}
+        self._lock = threading.Lock()
+        # Mode and setpoint of the last command, and when it was sent
+        self._mode = None
+        self._setpoint = None
+        self._command_time = None
+        # (time, temperature) of the reading the next update starts from
+        self._anchor = None
+        # Time of the last reading observed, a cached reading seen again is skipped
+        self._last_reading_time = None
+        self._last_save = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, model_config, clock=None):
+        """Create a model from the `thermal_model` section of config.yaml, loading the saved state"""
+        model = cls(
+            path=model_config.get("path") or None,
+            sample_interval=model_config.get("sample_interval", 300),
+            settle_time=model_config.get("settle_time", 300),
+            forgetting_factor=model_config.get("forgetting_factor", 0.995),
+            tolerance=model_config.get("tolerance", 0.5),
+            clock=clock
+        )
+        model.load()
+        return model
+
+    def load(self):
+        """Load the saved model, starting from scratch if there is none or it is unreadable"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") != FILE_VERSION:
+                raise ValueError(f"unsupported version {data.get('version')}")
+            self.models = {mode: RecursiveLeastSquares.from_dict(data["models"][mode]) for mode in MODES}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring saved thermal model {self.path}: {str(e)}")
+
+    def save(self):
+        """Write the model file atomically"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {"version": FILE_VERSION, "models": {mode: model.to_dict() for mode, model in self.models.items()}}
+        temporary_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(temporary_path, "w") as f:
+                json.dump(data, f)
+            os.replace(temporary_path, self.path)
+        except OSError as e:
+            logger.error(f"Failed to save thermal model: {str(e)}")
+
+    def start(self, sample):
+        """
+        Call sample() every sample_interval in the background, so that the model
+        keeps learning when nothing else reads the temperature
+
+        Args:
+            sample (callable): Reads the room temperature (AirPumpController.get_room_temperature)
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(sample,), name="thermal-model", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.save()
+
+    def command(self, mode, setpoint):
+        """Record a command sent to the air pump (mode heat, cool or off)"""
+        with self._lock:
+            self._mode = mode if mode in MODES else None
+            self._setpoint = setpoint
+            self._command_time = self.clock.now()
+            self._anchor = None
+
+    def observe(self, temperature, reading_time):
+        """
+        Learn from a room temperature reading
+
+        Args:
+            temperature (float): Room temperature in °C
+            reading_time (datetime): When the sensor took the reading; a cached
+                                     reading seen again has the same time and is skipped
+        """
+        with self._lock:
+            if reading_time == self._last_reading_time:
+                return
+            self._last_reading_time = reading_time
+            if self._mode is None or (reading_time - self._command_time).total_seconds() < self.settle_time:
+                return
+            if self._anchor is None:
+                self._anchor = (reading_time, temperature)
+                return
+            anchor_time, anchor_temperature = self._anchor
+            elapsed = (reading_time - anchor_time).total_seconds()
+            if elapsed < self.sample_interval:
+                return
+            self._anchor = (reading_time, temperature)
+            # A long gap without readings says little about the current rate
+            if elapsed > 3 * self.sample_interval:
+                return
+            rate = (temperature - anchor_temperature) / (elapsed / 3600)
+            gap = self._setpoint - (temperature + anchor_temperature) / 2
+            self.models[self._mode].update((gap, 1.0), rate, self.forgetting_factor)
+            now = self.clock.monotonic()
+            save = self._last_save is None or now - self._last_save >= SAVE_INTERVAL
+            if save:
+                self._last_save = now
+        if save:
+            self.save()
+
+    def predict(self, mode, setpoint, temperature) -> dict:
+        """
+        Predict the time for the room to go from temperature to setpoint
+
+        Returns:
+            dict: minutes_to_setpoint (None if unknown or unreachable, with the
+                  reason) and the equilibrium temperature of the room at that setpoint
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of: {', '.join(MODES)}")
+        model = self.models[mode]
+        k, c = model.theta
+        result = {"minutes_to_setpoint": None, "equilibrium": None, "reason": None}
+        if model.samples < MIN_SAMPLES:
+            result["reason"] = f"Not enough data yet ({model.samples}/{MIN_SAMPLES} samples)"
+            return result
+        if k <= 0:
+            result["reason"] = "The room does not follow the air pump in this mode"
+            return result
+        equilibrium = setpoint + c / k
+        result["equilibrium"] = round(equilibrium, 2)
+        target = setpoint - self.tolerance if mode == "heat" else setpoint + self.tolerance
+        if (temperature >= target) if mode == "heat" else (temperature <= target):
+            result["minutes_to_setpoint"] = 0.0
+            return result
+        ratio = (target - equilibrium) / (temperature - equilibrium)
+        if not 0 < ratio < 1:
+            result["reason"] = f"The room levels off at {equilibrium:.1f}°C"
+            return result
+        result["minutes_to_setpoint"] = round(-math.log(ratio) / k * 60, 1)
+        return result
+
+    def describe(self) -> dict:
+        """The fitted parameters of each mode"""
+        return {
+            mode: {
+                "rate_per_degree_per_hour": round(model.theta[0], 4),
+                "offset_per_hour": round(model.theta[1], 4),
+                "samples": model.samples
+            }
+            for mode, model in self.models.items()
+        }
+
+    def _run(self, sample):
+        while not self._stopped.wait(self.clock.timeout(self.sample_interval)):
+            try:
+                sample()
+            except Exception as e:
+                logger.error(f"Failed to sample the room temperature: {str(e)}")
@@ -0,0 +1,281 @@
+"""
+Bounded, priority-ordered transmit queue in front of the IR LED.
+
+The LED is a single serial resource, so every transmission runs on one worker
+thread. Power-off beats user commands, which beat automation; when the queue is
+full a new command either evicts a queued command of lower priority or is
+rejected with TransmitQueueFull, which the API turns into 429 + Retry-After.
+A duty-cycle cap limits how long the LED may be driven within a sliding window;
+a command still queued after `wait_timeout` seconds is dropped (TransmitQueueFull)
+so that callers are not held indefinitely. A transmission running longer than
+its airtime plus SEND_MARGIN raises TransmitTimeout in the caller, and so do
+the commands dropped while it blocks the worker.
+"""
+import heapq
+import itertools
+import math
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from enum import IntEnum
+from clock import SYSTEM_CLOCK
+
+class Priority(IntEnum):
+    """Transmission priority, lower values are sent first."""
+    POWER_OFF = 0
+    USER = 1
+    AUTOMATION = 2
+
+# Priorities callers may ask for; power-off is reserved for the off command
+COMMAND_PRIORITIES = (Priority.USER, Priority.AUTOMATION)
+# Seconds a transmission may run beyond its airtime (pigpio wave setup and cleanup)
+SEND_MARGIN = 5.0
+
+def parse_command_priority(name) -> Priority:
+    """Priority of a command from its name, e.g. "automation"; raises ValueError for other names"""
+    for priority in COMMAND_PRIORITIES:
+        if str(name).lower() == priority.name.lower():
+            return priority
+    raise ValueError(f"Unknown priority {name!r}, must be one of: {', '.join(p.name.lower() for p in COMMAND_PRIORITIES)}")
+
+class TransmitQueueFull(Exception):
+    """Raised when a command cannot be admitted to the transmit queue."""
+
+    def __init__(self, retry_after, message="Transmit queue is full"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TransmitTimeout(Exception):
+    """Raised when a transmission does not finish in its airtime plus SEND_MARGIN."""
+
+class TransmitQueue:
+    def __init__(self, max_depth=8, max_duty_cycle=0.1, duty_cycle_window=60.0, wait_timeout=10.0, clock=None):
+        """
+        Args:
+            max_depth (int): Maximum number of commands waiting to be sent
+            max_duty_cycle (float): Fraction of the window the LED may be transmitting
+            duty_cycle_window (float): Length of the duty-cycle window in seconds
+            wait_timeout (float): Seconds a caller waits for its command to be sent before it is dropped
+            clock (SystemClock): Clock for wait times and the duty-cycle window
+        """
+        self.clock = clock or SYSTEM_CLOCK
+        self.max_depth = max_depth
+        self.wait_timeout = wait_timeout
+        self.max_duty_cycle = max_duty_cycle
+        self.duty_cycle_window = duty_cycle_window
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._worker = None
+        # (start time, airtime) of the transmission running on the worker, None when idle
+        self._running = None
+        # (end time, airtime) of recent transmissions, for the duty-cycle cap
+        self._airtime_log = deque()
+        self._airtime_total = 0.0
+        # Counters
+        self.submitted = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.timed_out = 0
+        self.stalled = 0
+        self.completed = 0
+        self.failed = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+        self.last_service_time = 0.0
+        self.total_service_time = 0.0
+        self.duty_cycle_delays = 0
+
+    @classmethod
+    def from_config(cls, transmitter_config, clock=None):
+        """Create a queue from the `transmitter` section of config.yaml"""
+        return cls(
+            max_depth=transmitter_config.get("queue_max_depth", 8),
+            max_duty_cycle=transmitter_config.get("max_duty_cycle", 0.1),
+            duty_cycle_window=transmitter_config.get("duty_cycle_window", 60),
+            wait_timeout=transmitter_config.get("wait_timeout", 10),
+            clock=clock
+        )
+
+    def reconfigure(self, transmitter_config):
+        """Apply changed limits from the `transmitter` section of config.yaml, keeping queued commands"""
+        with self._condition:
+            self.max_depth = transmitter_config.get("queue_max_depth", 8)
+            self.max_duty_cycle = transmitter_config.get("max_duty_cycle", 0.1)
+            self.duty_cycle_window = transmitter_config.get("duty_cycle_window", 60)
+            self.wait_timeout = transmitter_config.get("wait_timeout", 10)
+            # A worker waiting on the duty-cycle cap re-evaluates its wait
+            self._condition.notify_all()
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="ir-transmit", daemon=True)
+            self._worker.start()
+
+    def _average_service_time(self):
+        if self.completed == 0:
+            return 1.0
+        return self.total_service_time / self.completed
+
+    def _retry_after(self):
+        """Estimate in whole seconds when a new command could be admitted."""
+        return max(1, math.ceil(len(self._heap) * self._average_service_time()))
+
+    def submit(self, priority, func, airtime=0.0) -> Future:
+        """
+        Queue func for transmission and return a Future for its result.
+
+        Args:
+            priority (Priority): Transmission priority
+            func (callable): Performs the transmission, runs on the worker thread
+            airtime (float): Seconds the LED is driven by this transmission
+
+        Raises:
+            TransmitQueueFull: If the queue is full of commands of equal or higher priority
+        """
+        future = Future()
+        with self._condition:
+            if len(self._heap) >= self.max_depth:
+                worst = max(self._heap)
+                if worst[0] <= priority:
+                    self.rejected += 1
+                    raise TransmitQueueFull(self._retry_after())
+                self._heap.remove(worst)
+                heapq.heapify(self._heap)
+                self.evicted += 1
+                worst[4].set_exception(TransmitQueueFull(
+                    self._retry_after(), "Command evicted by a higher priority command"))
+            heapq.heappush(self._heap, (priority, next(self._sequence), self.clock.monotonic(), func, future, airtime))
+            self.submitted += 1
+            self._ensure_worker()
+            self._condition.notify()
+        return future
+
+    def run(self, priority, func, airtime=0.0):
+        """
+        Submit func and wait at most wait_timeout seconds for its result.
+
+        Raises:
+            TransmitQueueFull: If the queue is full, or the command was still queued
+                               after wait_timeout seconds (it is then dropped, not sent)
+            TransmitTimeout: If the command was dropped behind a stalled transmission,
+                             or was sent and did not finish within airtime + SEND_MARGIN
+        """
+        future = self.submit(priority, func, airtime)
+        try:
+            return future.result(self.clock.timeout(self.wait_timeout))
+        except FutureTimeout:
+            pass
+        with self._condition:
+            for index, entry in enumerate(self._heap):
+                if entry[4] is future:
+                    del self._heap[index]
+                    heapq.heapify(self._heap)
+                    future.cancel()
+                    self.timed_out += 1
+                    if self._stalled(self.clock.monotonic()):
+                        self.stalled += 1
+                        raise TransmitTimeout("Transmitter stalled, command dropped")
+                    # Held back by the duty-cycle cap, the wait for the cap is the better estimate
+                    retry_after = max(self._retry_after(), math.ceil(self._duty_cycle_wait(airtime, self.clock.monotonic())))
+                    raise TransmitQueueFull(retry_after, "Timed out waiting for the transmitter, command dropped")
+        # Already being transmitted, the pigpio calls are not bounded themselves
+        try:
+            return future.result(self.clock.timeout(airtime + SEND_MARGIN))
+        except FutureTimeout:
+            self.stalled += 1
+            raise TransmitTimeout(f"Transmission did not finish within {airtime + SEND_MARGIN:.1f} s")
+
+    def _stalled(self, now) -> bool:
+        """Whether the running transmission has exceeded its airtime plus SEND_MARGIN"""
+        running = self._running
+        return running is not None and now - running[0] > running[1] + SEND_MARGIN
+
+    def _prune_airtime(self, now):
+        while self._airtime_log and self._airtime_log[0][0] <= now - self.duty_cycle_window:
+            self._airtime_total -= self._airtime_log.popleft()[1]
+
+    def _duty_cycle_wait(self, airtime, now):
+        """Return how long to wait before airtime more seconds fit under the cap."""
+        self._prune_airtime(now)
+        budget = self.max_duty_cycle * self.duty_cycle_window
+        excess = self._airtime_total + airtime - budget
+        if excess <= 0 or not self._airtime_log:
+            return 0.0
+        # Wait until enough old transmissions have left the window
+        released = 0.0
+        for end_time, used in self._airtime_log:
+            released += used
+            if released >= excess:
+                return end_time + self.duty_cycle_window - now
+        return self._airtime_log[-1][0] + self.duty_cycle_window - now
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    while not self._heap:
+                        self._condition.wait()
+                    # Leave the head queued while over the duty-cycle cap, so that a
+                    # higher priority command arriving meanwhile still goes first
+                    delay = self._duty_cycle_wait(self._heap[0][5], self.clock.monotonic())
+                    if delay <= 0:
+                        break
+                    self.duty_cycle_delays += 1
+                    self._condition.wait(self.clock.timeout(delay))
+                priority, _, enqueued_at, func, future, airtime = heapq.heappop(self._heap)
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            started = self.clock.monotonic()
+            self._running = (started, airtime)
+            wait = started - enqueued_at
+            self.last_wait = wait
+            self.max_wait = max(self.max_wait, wait)
+            self.total_wait += wait
+            try:
+                result = func()
+            except BaseException as e:
+                self.failed += 1
+                future.set_exception(e)
+            else:
+                self.completed += 1
+                future.set_result(result)
+            finished = self.clock.monotonic()
+            self._running = None
+            self.last_service_time = finished - started
+            self.total_service_time += self.last_service_time
+            with self._condition:
+                self._airtime_log.append((finished, airtime))
+                self._airtime_total += airtime
+
+    def depth(self) -> int:
+        """Number of commands waiting to be sent"""
+        return len(self._heap)
+
+    def stats(self) -> dict:
+        """Queue depth, wait times and duty-cycle usage"""
+        with self._condition:
+            depth = len(self._heap)
+            self._prune_airtime(self.clock.monotonic())
+            airtime_total = self._airtime_total
+        dequeued = self.completed + self.failed
+        return {
+            "depth": depth,
+            "max_depth": self.max_depth,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+            "timed_out": self.timed_out,
+            "stalled": self.stalled,
+            "completed": self.completed,
+            "failed": self.failed,
+            "last_wait_seconds": round(self.last_wait, 4),
+            "max_wait_seconds": round(self.max_wait, 4),
+            "average_wait_seconds": round(self.total_wait / dequeued, 4) if dequeued else 0.0,
+            "last_service_seconds": round(self.last_service_time, 4),
+            "duty_cycle": round(airtime_total / self.duty_cycle_window, 4),
+            "max_duty_cycle": self.max_duty_cycle,
+            "duty_cycle_delays": self.duty_cycle_delays
+        }
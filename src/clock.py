@@ -0,0 +1,54 @@
+"""
+Clocks for timestamps, sensor caching and transmit pacing.
+
+Everything time-dependent (AirPumpController, TransmitQueue, TemperatureSensor
+and the Mitsubishi clock byte) takes an optional clock, defaulting to
+SYSTEM_CLOCK. tools/replay.py runs them on a WarpClock to replay a day of
+traffic in seconds.
+"""
+import time
+from datetime import datetime, timedelta
+
+class SystemClock:
+    """Wall-clock time."""
+
+    def now(self) -> datetime:
+        """Current local time."""
+        return datetime.now()
+
+    def monotonic(self) -> float:
+        """Seconds on a clock that never goes backwards."""
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def timeout(self, seconds) -> float:
+        """Real seconds to block (e.g. in Condition.wait) for seconds of clock time."""
+        return seconds
+
+class WarpClock(SystemClock):
+    """Clock running `speed` times faster than real time from `start`."""
+
+    def __init__(self, speed=60.0, start=None):
+        self.speed = speed
+        self.start = start if start is not None else datetime.now()
+        self._real_start = time.monotonic()
+
+    def elapsed(self) -> float:
+        """Clock seconds since the clock was created."""
+        return (time.monotonic() - self._real_start) * self.speed
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self.elapsed())
+
+    def monotonic(self) -> float:
+        return self.elapsed()
+
+    def sleep(self, seconds):
+        time.sleep(seconds / self.speed)
+
+    def timeout(self, seconds) -> float:
+        return seconds / self.speed
+
+SYSTEM_CLOCK = SystemClock()
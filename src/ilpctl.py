@@ -0,0 +1,82 @@
+"""
+Command line client for the local control socket.
+
+Talks to the running API (local mode) or the transmitter daemon (daemon mode)
+over a Unix domain socket, without going through HTTP. Only the standard
+library and PyYAML are imported, so a call costs a few milliseconds.
+
+Usage (from the src directory):
+    python -m ilpctl heat 22 [fan=high] [vertical=top] [horizontal=middle] [priority=automation]
+    python -m ilpctl cool 20
+    python -m ilpctl preset night_heat [priority=automation]
+    python -m ilpctl off
+    python -m ilpctl state
+    python -m ilpctl room_temperature
+    python -m ilpctl queue
+    python -m ilpctl presets
+
+The socket is taken from --socket PATH, the ILP_CONTROL_SOCKET environment
+variable, or config.yaml, in that order.
+
+Exit status: 0 on success, 1 on errors, 75 (EX_TEMPFAIL) when the transmit
+queue is full; retry after the number of seconds printed on stderr.
+"""
+import json
+import os
+import socket
+import sys
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config.yaml")
+EX_TEMPFAIL = 75
+
+def socket_path_from_config(config_path=CONFIG_PATH):
+    """Return the socket serving the controller according to config.yaml."""
+    import yaml
+    with open(config_path, "r") as f:
+        config = yaml.safe_load(f)
+    if config.get("transmitter", {}).get("mode", "local") == "daemon":
+        return config["transmitter"].get("socket_path", "/run/mitsubishi-ilp/transmitter.sock")
+    return config.get("control", {}).get("socket_path", "/run/mitsubishi-ilp/control.sock")
+
+def request(socket_path, command, timeout=30.0):
+    """Send one plain-word command line and return the decoded response."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(command.encode() + b"\n")
+        with sock.makefile("rb") as response:
+            line = response.readline()
+    if not line:
+        raise ConnectionError("Connection closed without a response")
+    return json.loads(line)
+
+def main(argv=None):
+    args = list(sys.argv[1:] if argv is None else argv)
+    socket_path = os.environ.get("ILP_CONTROL_SOCKET")
+    if len(args) >= 2 and args[0] == "--socket":
+        socket_path = args[1]
+        args = args[2:]
+    if not args or args[0] in ("-h", "--help"):
+        print(__doc__.strip())
+        return 0 if args else 1
+
+    try:
+        if socket_path is None:
+            socket_path = socket_path_from_config()
+        response = request(socket_path, " ".join(args))
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+
+    if not response.get("ok"):
+        print(f"Error: {response.get('error')}", file=sys.stderr)
+        if "retry_after" in response:
+            print(response["retry_after"], file=sys.stderr)
+            return EX_TEMPFAIL
+        return 1
+    if response.get("result") is not None:
+        print(json.dumps(response["result"], indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+"""
+Capture of emitted pulse trains and timing-accuracy checks.
+
+CapturingPigpio stands in for libpigpio.so and records every wave handed to
+gpioWaveAddGeneric, so a command goes through the exact transmit code path
+without touching the GPIO. Captures are stored in a compact binary format:
+
+    header   "<8sBBHII": magic, version, gpio pin, reserved, carrier Hz, pulse count
+    payload  zlib-compressed little-endian uint16 per pulse, bit 15 set when the
+             pin is driven high, bits 0-14 the pulse duration in microseconds
+
+A capture is decoded into symbols: a mark is a run of carrier pulses (the
+off half of each carrier period included), a space is the pin held low. Each
+symbol is matched with its nominal Delay constant, so rounding of the carrier
+periods shows up as per-symbol timing error.
+
+A golden capture per command of GOLDEN_COMMANDS, sent with a fixed clock, is
+kept in the golden/ directory. An optimised encoder is timing-equivalent to
+the current path when `golden check` passes.
+
+Usage (from the src directory):
+    python -m ir_sender.capture report FILE [FILE...]
+    python -m ir_sender.capture compare FILE FILE
+    python -m ir_sender.capture golden check|update [DIR]
+"""
+import os
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime
+from . import ir_sender
+from .mitsubishi import (
+    Mitsubishi, Delay, Constants, ClimateMode, FanMode, VanneVerticalMode, VanneHorizontalMode,
+    ISeeMode, AreaMode, PowerfulMode
+)
+
+MAGIC = b"IRCAPT01"
+VERSION = 1
+HEADER = struct.Struct("<8sBBHII")
+LEVEL_BIT = 0x8000
+MAX_DURATION = LEVEL_BIT - 1
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+GOLDEN_CLOCK = datetime(2024, 1, 1, 12, 0)
+GOLDEN_PIN = 23
+
+# Name -> Mitsubishi.send_command arguments (None: power_off)
+GOLDEN_COMMANDS = {
+    "off": None,
+    "heat_22": dict(climate_mode=ClimateMode.Hot, temperature=22),
+    "cool_20_high_top_left": dict(
+        climate_mode=ClimateMode.Cold, temperature=20, fan_mode=FanMode.Speed3,
+        vanne_vertical_mode=VanneVerticalMode.Top, vanne_horizontal_mode=VanneHorizontalMode.Left),
+    "heat_16_swing_isee": dict(
+        climate_mode=ClimateMode.Hot, temperature=16, fan_mode=FanMode.Speed1,
+        vanne_vertical_mode=VanneVerticalMode.Swing, vanne_horizontal_mode=VanneHorizontalMode.Swing,
+        isee_mode=ISeeMode.ISeeOn, area_mode=AreaMode.Full),
+    "cool_31_powerful_timers": dict(
+        climate_mode=ClimateMode.Cold, temperature=31, powerful=PowerfulMode.PowerfulOn,
+        start_time=datetime(2024, 1, 1, 18, 0), end_time=datetime(2024, 1, 1, 23, 30)),
+}
+
+# Nominal durations of the Mitsubishi symbols. Marks are named after the
+# space that follows them: BitMark and RptMark are almost the same length.
+MITSUBISHI_SPACES = {
+    "HdrSpace": Delay.HdrSpace,
+    "OneSpace": Delay.OneSpace,
+    "ZeroSpace": Delay.ZeroSpace,
+    "RptSpace": Delay.RptSpace,
+}
+MITSUBISHI_MARKS = {
+    "HdrSpace": ("HdrMark", Delay.HdrMark),
+    "OneSpace": ("BitMark", Delay.BitMark),
+    "ZeroSpace": ("BitMark", Delay.BitMark),
+    "RptSpace": ("RptMark", Delay.RptMark),
+}
+
+class CapturingPigpio:
+    """
+    CapturingPigpio: Records the waves that would be transmitted by libpigpio.so
+    """
+    def __init__(self):
+        self.waves = []
+        self._pending = []
+
+    def gpioInitialise(self):
+        return 0
+
+    def gpioSetMode(self, gpio, mode):
+        return 0
+
+    def gpioWaveClear(self):
+        self._pending = []
+        return 0
+
+    def gpioWaveAddGeneric(self, count, pulses):
+        self._pending.extend((pulses[i].gpioOn, pulses[i].gpioOff, pulses[i].usDelay) for i in range(count))
+        return len(self._pending)
+
+    def gpioWaveCreate(self):
+        self.waves.append(self._pending)
+        self._pending = []
+        return len(self.waves) - 1
+
+    def gpioWaveTxSend(self, wave_id, mode):
+        return len(self.waves[wave_id])
+
+    def gpioWaveTxBusy(self):
+        return 0
+
+    def gpioWaveDelete(self, wave_id):
+        return 0
+
+    def gpioTerminate(self):
+        return 0
+
+class Capture:
+    """
+    Capture: Pulse train as (level, duration in microseconds) pairs
+    """
+    def __init__(self, pulses, gpio_pin=0, carrier=0):
+        self.pulses = [(int(bool(level)), duration) for level, duration in pulses]
+        self.gpio_pin = gpio_pin
+        self.carrier = carrier
+
+    @classmethod
+    def from_wave(cls, wave, gpio_pin, carrier=0):
+        """Build a capture from the (gpioOn, gpioOff, usDelay) pulses of a wave."""
+        mask = 1 << gpio_pin
+        return cls([(1 if on & mask else 0, delay) for on, off, delay in wave], gpio_pin, carrier)
+
+    def __eq__(self, other):
+        return isinstance(other, Capture) and self.pulses == other.pulses
+
+    def airtime(self):
+        """Microseconds from the first to the end of the last pulse."""
+        return sum(duration for _, duration in self.pulses)
+
+    def to_bytes(self):
+        words = array("H")
+        for level, duration in self.pulses:
+            if duration > MAX_DURATION:
+                raise ValueError(f"Pulse of {duration} us does not fit the capture format")
+            words.append(duration | (LEVEL_BIT if level else 0))
+        if sys.byteorder != "little":
+            words.byteswap()
+        header = HEADER.pack(MAGIC, VERSION, self.gpio_pin, 0, self.carrier, len(self.pulses))
+        return header + zlib.compress(words.tobytes(), 9)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, gpio_pin, _, carrier, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a pulse capture")
+        words = array("H")
+        words.frombytes(zlib.decompress(data[HEADER.size:]))
+        if sys.byteorder != "little":
+            words.byteswap()
+        if len(words) != count:
+            raise ValueError(f"Capture holds {len(words)} pulses, header says {count}")
+        return cls([(1 if word & LEVEL_BIT else 0, word & MAX_DURATION) for word in words], gpio_pin, carrier)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+def symbols(capture):
+    """
+    symbols: Decodes a capture into a list of ("mark" | "space", duration) pairs
+    """
+    result = []
+    previous_level = None
+    for level, duration in capture.pulses:
+        # A low pulse right after a high one is the off half of a carrier period
+        kind = "mark" if level or previous_level == 1 else "space"
+        if result and result[-1][0] == kind:
+            result[-1][1] += duration
+        else:
+            result.append([kind, duration])
+        previous_level = level
+    return [(kind, duration) for kind, duration in result]
+
+def classify(decoded, spaces=MITSUBISHI_SPACES, marks=MITSUBISHI_MARKS):
+    """
+    classify: Names every symbol after its nearest nominal duration
+
+    Spaces are matched on duration; a mark takes the name and nominal duration
+    given by marks for the space that follows it. Returns (name, nominal, duration) triples.
+    """
+    named_spaces = []
+    for kind, duration in decoded:
+        if kind == "space":
+            named_spaces.append(min(spaces.items(), key=lambda item: abs(item[1] - duration)))
+    result = []
+    space_index = 0
+    for kind, duration in decoded:
+        if kind == "space":
+            name, nominal = named_spaces[space_index]
+            space_index += 1
+        elif space_index < len(named_spaces):
+            name, nominal = marks[named_spaces[space_index][0]]
+        else:
+            name, nominal = "Mark", duration
+        result.append((name, nominal, duration))
+    return result
+
+def report(capture, spaces=MITSUBISHI_SPACES, marks=MITSUBISHI_MARKS):
+    """
+    report: Pulse count, airtime and timing error per symbol name
+    """
+    decoded = symbols(capture)
+    per_symbol = {}
+    for name, nominal, duration in classify(decoded, spaces, marks):
+        stats = per_symbol.setdefault(name, {"nominal": nominal, "count": 0, "min": duration, "max": duration, "total_error": 0})
+        stats["count"] += 1
+        stats["min"] = min(stats["min"], duration)
+        stats["max"] = max(stats["max"], duration)
+        stats["total_error"] += duration - nominal
+    for stats in per_symbol.values():
+        stats["mean_error"] = stats.pop("total_error") / stats["count"]
+    return {
+        "pulses": len(capture.pulses),
+        "symbols": len(decoded),
+        "airtime_us": capture.airtime(),
+        "mark_us": sum(duration for kind, duration in decoded if kind == "mark"),
+        "per_symbol": per_symbol
+    }
+
+def compare(expected, actual):
+    """
+    compare: Returns None when two captures are timing-equivalent, else the first difference
+
+    Captures are equivalent when they decode into the same symbols with the
+    same durations and use the same carrier pulse durations.
+    """
+    if expected == actual:
+        return None
+    expected_symbols, actual_symbols = symbols(expected), symbols(actual)
+    for i, (a, b) in enumerate(zip(expected_symbols, actual_symbols)):
+        if a != b:
+            return f"symbol {i}: expected {a[0]} of {a[1]} us, got {b[0]} of {b[1]} us"
+    if len(expected_symbols) != len(actual_symbols):
+        return f"expected {len(expected_symbols)} symbols, got {len(actual_symbols)}"
+    def carrier(capture):
+        return {pulse for i, pulse in enumerate(capture.pulses)
+                if pulse[0] or (i > 0 and capture.pulses[i - 1][0])}
+    if carrier(expected) != carrier(actual):
+        return f"carrier pulses differ: expected {sorted(carrier(expected))}, got {sorted(carrier(actual))}"
+    return None
+
+def capture_command(settings, clock=GOLDEN_CLOCK, gpio_pin=GOLDEN_PIN):
+    """
+    capture_command: Sends one command through Mitsubishi into a Capture
+
+    settings are Mitsubishi.send_command arguments, None sends power_off.
+    """
+    pigpio = CapturingPigpio()
+    mitsubishi = Mitsubishi(gpio_pin, ir_sender.LogLevel.ErrorsOnly, pigpio=pigpio, clock=lambda: clock)
+    if settings is None:
+        mitsubishi.power_off()
+    else:
+        mitsubishi.send_command(**settings)
+    if len(pigpio.waves) != 1:
+        raise RuntimeError(f"Expected one wave, {len(pigpio.waves)} were sent")
+    return Capture.from_wave(pigpio.waves[0], gpio_pin, Constants.Frequency)
+
+def check_golden(directory=GOLDEN_DIR, update=False):
+    """
+    check_golden: Compares (or rewrites) the golden capture of every command, returning the failures
+    """
+    failures = []
+    for name, settings in GOLDEN_COMMANDS.items():
+        path = os.path.join(directory, f"{name}.ircap")
+        capture = capture_command(settings)
+        if update:
+            os.makedirs(directory, exist_ok=True)
+            capture.save(path)
+            continue
+        if not os.path.exists(path):
+            failures.append(f"{name}: missing {path}")
+            continue
+        difference = compare(Capture.load(path), capture)
+        if difference is not None:
+            failures.append(f"{name}: {difference}")
+    return failures
+
+def print_report(name, capture):
+    result = report(capture)
+    print(f"{name}: {result['pulses']} pulses, {result['symbols']} symbols, "
+          f"airtime {result['airtime_us'] / 1000:.2f} ms (carrier on {result['mark_us'] / 1000:.2f} ms)")
+    print(f"  {'symbol':<10} {'count':>5} {'nominal':>8} {'min':>6} {'max':>6} {'mean error':>11}")
+    for symbol, stats in result["per_symbol"].items():
+        print(f"  {symbol:<10} {stats['count']:>5} {stats['nominal']:>8} {stats['min']:>6} {stats['max']:>6} "
+              f"{stats['mean_error']:>+8.1f} us")
+
+def main(argv):
+    if len(argv) >= 2 and argv[0] == "report":
+        for path in argv[1:]:
+            print_report(path, Capture.load(path))
+        return 0
+    if len(argv) == 3 and argv[0] == "compare":
+        difference = compare(Capture.load(argv[1]), Capture.load(argv[2]))
+        print("timing-equivalent" if difference is None else difference)
+        return 0 if difference is None else 1
+    if len(argv) in (2, 3) and argv[0] == "golden" and argv[1] in ("check", "update"):
+        directory = argv[2] if len(argv) == 3 else GOLDEN_DIR
+        failures = check_golden(directory, update=argv[1] == "update")
+        if argv[1] == "update":
+            print(f"Wrote {len(GOLDEN_COMMANDS)} captures to {directory}")
+            return 0
+        for failure in failures:
+            print(failure)
+        print(f"{len(GOLDEN_COMMANDS) - len(failures)}/{len(GOLDEN_COMMANDS)} golden captures match")
+        return 1 if failures else 0
+    print(__doc__.strip())
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
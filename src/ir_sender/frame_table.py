@@ -0,0 +1,133 @@
+"""
+Precomputed table of every Mitsubishi frame, memory-mapped from disk.
+
+A frame is a pure function of a small discrete state (temperature, climate,
+fan, vanes, i-See, area, powerful and power modes). Only the Clock byte and
+the CRC depend on the time, so the table stores each frame with Clock = 0 and
+the lookup patches both in: CRC(clock) = CRC(0) + clock (mod 256).
+
+Records are laid out in mixed-radix order of the field values below, so the
+position of a frame is computed arithmetically. The table is read through
+mmap, so it lives in the page cache and is shared by every process using it.
+Frames with start/end timers are not in the table.
+
+Build the table with:
+    python -m ir_sender.frame_table build /var/lib/mitsubishi-ilp/frames.bin
+"""
+import mmap
+import os
+import struct
+import sys
+from datetime import datetime
+from .mitsubishi import (
+    PowerMode, ClimateMode, ISeeMode, PowerfulMode, VanneHorizontalMode, FanMode,
+    VanneVerticalMode, AreaMode, Index, Constants, encode_frame
+)
+
+MAGIC = b"MITSFT01"
+HEADER = struct.Struct("<8sI")
+
+# Field values in table order; the first field varies slowest
+FIELDS = (
+    ("power_mode", (PowerMode.PowerOff, PowerMode.PowerOn)),
+    ("climate_mode", (ClimateMode.Hot, ClimateMode.Cold, ClimateMode.Dry, ClimateMode.Auto)),
+    ("temperature", tuple(range(Constants.MinTemp, Constants.MaxTemp + 1))),
+    ("fan_mode", (FanMode.Speed1, FanMode.Speed2, FanMode.Speed3, FanMode.Auto)),
+    ("vanne_vertical_mode", (VanneVerticalMode.Auto, VanneVerticalMode.Top, VanneVerticalMode.MiddleTop,
+                             VanneVerticalMode.Middle, VanneVerticalMode.MiddleBottom,
+                             VanneVerticalMode.Bottom, VanneVerticalMode.Swing)),
+    ("vanne_horizontal_mode", (VanneHorizontalMode.NotSet, VanneHorizontalMode.Left,
+                               VanneHorizontalMode.MiddleLeft, VanneHorizontalMode.Middle,
+                               VanneHorizontalMode.MiddleRight, VanneHorizontalMode.Right,
+                               VanneHorizontalMode.Swing)),
+    ("isee_mode", (ISeeMode.ISeeOff, ISeeMode.ISeeOn)),
+    ("area_mode", (AreaMode.NotSet, AreaMode.Left, AreaMode.Right, AreaMode.Full)),
+    ("powerful", (PowerfulMode.PowerfulOff, PowerfulMode.PowerfulOn)),
+)
+
+# For every field, value -> contribution of that value to the record index
+_STRIDES = []
+_stride = 1
+for _, values in reversed(FIELDS):
+    _STRIDES.insert(0, _stride)
+    _stride *= len(values)
+RECORD_COUNT = _stride
+(_POWER, _CLIMATE, _TEMPERATURE, _FAN, _VERTICAL, _HORIZONTAL, _ISEE, _AREA, _POWERFUL) = (
+    {value: i * stride for i, value in enumerate(values)}
+    for (_, values), stride in zip(FIELDS, _STRIDES)
+)
+
+_MIDNIGHT = datetime(2000, 1, 1)
+
+def record_index(power_mode, climate_mode, temperature, fan_mode, vanne_vertical_mode, vanne_horizontal_mode, isee_mode, area_mode, powerful):
+    """
+    record_index: Position of the frame for the given settings in the table
+    """
+    temperature = max(Constants.MinTemp, min(Constants.MaxTemp, temperature))
+    return (_POWER[power_mode] + _CLIMATE[climate_mode] + _TEMPERATURE[temperature]
+            + _FAN[fan_mode] + _VERTICAL[vanne_vertical_mode] + _HORIZONTAL[vanne_horizontal_mode]
+            + _ISEE[isee_mode] + _AREA[area_mode] + _POWERFUL[powerful])
+
+def _records():
+    """Yield every frame in table order, with Clock = 0."""
+    def walk(depth, state):
+        if depth == len(FIELDS):
+            settings = dict(state)
+            yield bytes(encode_frame(
+                settings["climate_mode"], settings["temperature"], settings["fan_mode"],
+                settings["vanne_vertical_mode"], settings["vanne_horizontal_mode"],
+                settings["isee_mode"], settings["area_mode"], None, None,
+                settings["powerful"], settings["power_mode"], _MIDNIGHT))
+            return
+        name, values = FIELDS[depth]
+        for value in values:
+            yield from walk(depth + 1, state + ((name, value),))
+    return walk(0, ())
+
+def build(path):
+    """
+    build: Writes the full frame table to path (atomically replacing it)
+    """
+    tmp_path = f"{path}.tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, RECORD_COUNT))
+        for record in _records():
+            f.write(record)
+    os.replace(tmp_path, path)
+
+class FrameTable:
+    """
+    FrameTable: Read-only, memory-mapped view of a table written by build()
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or count != RECORD_COUNT or len(self._map) != HEADER.size + count * Constants.NbBytes:
+            self._map.close()
+            raise ValueError(f"Invalid frame table: {path}")
+
+    def close(self):
+        self._map.close()
+
+    def lookup(self, now, climate_mode, temperature, fan_mode, vanne_vertical_mode, vanne_horizontal_mode, isee_mode, area_mode, powerful, power_mode):
+        """
+        lookup: Returns the frame for the given settings with the clock of now patched in
+        """
+        offset = HEADER.size + Constants.NbBytes * record_index(
+            power_mode, climate_mode, temperature, fan_mode, vanne_vertical_mode,
+            vanne_horizontal_mode, isee_mode, area_mode, powerful)
+        data = bytearray(self._map[offset:offset + Constants.NbBytes])
+        clock = now.hour * 6 + now.minute // 10
+        data[Index.Clock] = clock
+        data[Index.CRC] = (data[Index.CRC] + clock) % (Constants.MaxMask + 1)
+        return data
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "build":
+        print("Usage: python -m ir_sender.frame_table build PATH")
+        sys.exit(1)
+    build(sys.argv[2])
+    print(f"Wrote {RECORD_COUNT} frames to {sys.argv[2]}")
@@ -1,4 +1,6 @@
 import ctypes
+import os
+import threading
 import time
 
 class LogLevel:
@@ -14,15 +16,86 @@ class Pulses_struct(ctypes.Structure):
                 ("gpioOff", ctypes.c_uint32),
                 ("usDelay", ctypes.c_uint32)]
 
-# Since both NEC and RC-5 protocols use the same method for generating waveform,
-# it can be put in a separate class and called from both protocol's classes.
+MAX_PULSES = 12000 # from pigpio.h
+PULSE_SIZE = ctypes.sizeof(Pulses_struct)
+
+# Pulse arrays are large (12 bytes per pulse), so instead of allocating one per
+# command they are kept in a pool and reused. There is one pool per array size.
+class PulseBufferPool():
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.array_type = Pulses_struct * capacity
+        self._free = []
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.acquisitions = 0
+        self.in_use = 0
+
+    def acquire(self):
+        with self._lock:
+            self.acquisitions += 1
+            self.in_use += 1
+            if self._free:
+                return self._free.pop()
+            self.allocations += 1
+        return self.array_type()
+
+    def release(self, buffer):
+        with self._lock:
+            self.in_use -= 1
+            self._free.append(buffer)
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "buffer_bytes": ctypes.sizeof(self.array_type),
+            "allocations": self.allocations,
+            "acquisitions": self.acquisitions,
+            "in_use": self.in_use,
+            "free": len(self._free)
+        }
+
+_pulse_pools = {}
+_pulse_pools_lock = threading.Lock()
+
+def get_pulse_pool(capacity=MAX_PULSES):
+    """Returns the shared pool of pulse arrays with the given capacity."""
+    with _pulse_pools_lock:
+        pool = _pulse_pools.get(capacity)
+        if pool is None:
+            pool = _pulse_pools[capacity] = PulseBufferPool(capacity)
+        return pool
+
+def memory_stats():
+    """Returns the process RSS and the pulse buffer pool statistics."""
+    rss = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    return {
+        "rss_bytes": rss,
+        "pulse_pools": [pool.stats() for pool in list(_pulse_pools.values())]
+    }
+
+# Since NEC, RC-5 and RAW all use the same method for generating waveform,
+# it can be put in a separate class and called from every protocol's classes.
 class Wave_generator():
-    def __init__(self, protocol, log_level = LogLevel.Minimal):
+    def __init__(self, protocol, log_level = LogLevel.Minimal, max_pulses = MAX_PULSES):
         self.protocol = protocol
         self.log_level = log_level
-        MAX_PULSES = 12000 # from pigpio.h
-        Pulses_array = Pulses_struct * MAX_PULSES
-        self.pulses = Pulses_array()
+        self.pool = get_pulse_pool(max_pulses)
+        # Taken from the pool with the first pulse, a generator that only sends
+        # compiled waves never needs one
+        self.pulses = None
+        self.pulse_count = 0
+
+    # Return the pulse array to the pool and start over with an empty one
+    def release(self):
+        if self.pulses is not None:
+            self.pool.release(self.pulses)
+            self.pulses = None
         self.pulse_count = 0
 
     def __log(self, min_log_level, message):
@@ -30,11 +103,22 @@ class Wave_generator():
             print(message)
 
     def add_pulse(self, gpioOn, gpioOff, usDelay):
+        if self.pulses is None:
+            self.pulses = self.pool.acquire()
         self.pulses[self.pulse_count].gpioOn = gpioOn
         self.pulses[self.pulse_count].gpioOff = gpioOff
         self.pulses[self.pulse_count].usDelay = usDelay
         self.pulse_count += 1
 
+    # Append pulses already packed as Pulses_struct bytes (see ProtocolEncoder)
+    def add_pulses(self, data, count):
+        if self.pulse_count + count > self.pool.capacity:
+            raise IndexError(f"{self.pulse_count + count} pulses do not fit the buffer of {self.pool.capacity}")
+        if self.pulses is None:
+            self.pulses = self.pool.acquire()
+        ctypes.memmove(ctypes.addressof(self.pulses) + self.pulse_count * PULSE_SIZE, data, count * PULSE_SIZE)
+        self.pulse_count += count
+
     # Pull the specified output pin low
     def zero(self, duration):
         self.__log(LogLevel.Verbose, "SPACE\t%s" % duration)
@@ -43,10 +127,7 @@ class Wave_generator():
     # Protocol-agnostic square wave generator
     def one(self, duration):
         self.__log(LogLevel.Verbose, " MARK\t%s" % duration)
-        period_time = 1000000.0 / self.protocol.frequency
-        on_duration = int(round(period_time * self.protocol.duty_cycle))
-        off_duration = int(round(period_time * (1.0 - self.protocol.duty_cycle)))
-        total_periods = int(round(duration/period_time))
+        on_duration, off_duration, total_periods = carrier_periods(self.protocol.frequency, self.protocol.duty_cycle, duration)
         total_pulses = total_periods * 2
 
         # Generate square wave on the specified output pin
@@ -56,8 +137,145 @@ class Wave_generator():
             else:
                 self.add_pulse(0, 1 << self.protocol.master.gpio_pin, off_duration)
 
+def carrier_periods(frequency, duty_cycle, duration):
+    """Returns the on and off microseconds of one carrier period and the number of periods in a mark."""
+    period_time = 1000000.0 / frequency
+    on_duration = int(round(period_time * duty_cycle))
+    off_duration = int(round(period_time * (1.0 - duty_cycle)))
+    total_periods = int(round(duration/period_time))
+    return on_duration, off_duration, total_periods
+
+# Symbol levels in a ProtocolSpec
+MARK = 1  # carrier on for the duration
+SPACE = 0 # pin held low for the duration
+
+class ProtocolSpec():
+    """
+    Describes an IR protocol as data, so new protocols need no code.
+
+    Every part is a sequence of (level, duration) symbols, level being MARK or
+    SPACE and duration in microseconds:
+        header:  sent before the bits (e.g. the AGC burst)
+        zero:    symbols of a "0" bit
+        one:     symbols of a "1" bit
+        trailer: sent after the bits (e.g. a stop pulse and the gap before a repeat)
+    Repeats are the nb argument of IrSender.send_code / compile_code.
+    """
+    def __init__(self, zero, one, header=(), trailer=(), frequency=38000, duty_cycle=0.33):
+        self.zero = tuple(tuple(symbol) for symbol in zero)
+        self.one = tuple(tuple(symbol) for symbol in one)
+        self.header = tuple(tuple(symbol) for symbol in header)
+        self.trailer = tuple(tuple(symbol) for symbol in trailer)
+        self.frequency = frequency
+        self.duty_cycle = duty_cycle
+
+    def key(self):
+        return (self.zero, self.one, self.header, self.trailer, self.frequency, self.duty_cycle)
+
+    def __eq__(self, other):
+        return isinstance(other, ProtocolSpec) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+class ProtocolEncoder():
+    """
+    A ProtocolSpec compiled for one GPIO pin into pulse templates.
+
+    The header, trailer and both bits are generated once as packed pulses; the
+    templates of 8-bit chunks of a code are built from the bit templates on first
+    use. Encoding a code is then a few dictionary lookups and one memmove into
+    the pulse buffer, instead of generating every carrier period in Python.
+    """
+    CHUNK_BITS = 8
+
+    def __init__(self, spec, gpio_pin):
+        self.spec = spec
+        self.gpio_pin = gpio_pin
+        self.header = self.compile_symbols(spec.header)
+        self.trailer = self.compile_symbols(spec.trailer)
+        self.bits = {"0": self.compile_symbols(spec.zero), "1": self.compile_symbols(spec.one)}
+        # chunk of the code string -> (packed pulses, pulse count), filled on first use
+        self.chunks = {}
+
+    def compile_symbols(self, symbols):
+        """Returns the symbols as (packed pulses, pulse count)."""
+        mask = 1 << self.gpio_pin
+        pulses = []
+        for level, duration in symbols:
+            if level == MARK:
+                on_duration, off_duration, total_periods = carrier_periods(self.spec.frequency, self.spec.duty_cycle, duration)
+                pulses.extend(((mask, 0, on_duration), (0, mask, off_duration)) * total_periods)
+            else:
+                pulses.append((0, mask, duration))
+        array = (Pulses_struct * len(pulses))(*pulses)
+        return bytes(array), len(pulses)
+
+    def chunk(self, bits):
+        template = self.chunks.get(bits)
+        if template is None:
+            parts = [self.bits[bit] for bit in bits]
+            template = self.chunks[bits] = (b"".join(data for data, _ in parts), sum(count for _, count in parts))
+        return template
+
+    def emit(self, wave_generator, ircode):
+        """
+        Appends the pulses of one frame of ircode to wave_generator.
+
+        Raises:
+            ValueError: If ircode contains anything but "0" and "1".
+        """
+        parts = [self.header]
+        try:
+            for i in range(0, len(ircode), self.CHUNK_BITS):
+                parts.append(self.chunk(ircode[i:i + self.CHUNK_BITS]))
+        except KeyError:
+            raise ValueError("Non-binary digit in IR code")
+        parts.append(self.trailer)
+        wave_generator.add_pulses(b"".join(data for data, _ in parts), sum(count for _, count in parts))
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+def get_encoder(spec, gpio_pin):
+    """Returns the shared ProtocolEncoder of a spec for a GPIO pin."""
+    key = (spec, gpio_pin)
+    encoder = _encoders.get(key)
+    if encoder is None:
+        with _encoders_lock:
+            encoder = _encoders.get(key)
+            if encoder is None:
+                encoder = _encoders[key] = ProtocolEncoder(spec, gpio_pin)
+    return encoder
+
+# Protocol described by a ProtocolSpec. NEC, RC-5 and RAW below only translate
+# their parameters into a spec.
+class TableProtocol():
+    def __init__(self, master, log_level, spec, max_pulses=MAX_PULSES):
+        self.master = master
+        self.log_level = log_level
+        self.spec = spec
+        self.frequency = spec.frequency
+        self.duty_cycle = spec.duty_cycle
+        self.wave_generator = Wave_generator(self, log_level, max_pulses)
+
+    def _log(self, min_log_level, message):
+        if min_log_level <= self.log_level:
+            print(message)
+
+    # This function is processing IR code. Leaves room for possible manipulation
+    # of the code before processing it.
+    def process_code(self, ircode):
+        self._log(LogLevel.Normal, "Sending data")
+        try:
+            get_encoder(self.spec, self.master.gpio_pin).emit(self.wave_generator, ircode)
+        except ValueError:
+            self._log(LogLevel.ErrorsOnly, "ERROR! Non-binary digit!")
+            return 1
+        return 0
+
 # NEC protocol class
-class NEC():
+class NEC(TableProtocol):
     def __init__(self,
                 master,
                 log_level = LogLevel.Minimal,
@@ -70,12 +288,8 @@ class NEC():
                 zero_pulse_duration = 562,
                 zero_gap_duration = 562,
                 trailing_pulse_duration = 562,
-                trailing_gap_duration = 0):
-        self.master = master
-        self.log_level = log_level
-        self.wave_generator = Wave_generator(self, log_level)
-        self.frequency = frequency # in Hz, 38000 per specification
-        self.duty_cycle = duty_cycle # duty cycle of high state pulse
+                trailing_gap_duration = 0,
+                max_pulses = MAX_PULSES):
         # Durations of high pulse and low "gap".
         # The NEC protocol defines pulse and gap lengths, but we can never expect
         # that any given TV will follow the protocol specification.
@@ -87,175 +301,183 @@ class NEC():
         self.zero_gap_duration = zero_gap_duration # in microseconds, 562 per specification
         self.trailing_pulse_duration = trailing_pulse_duration # trailing 562 microseconds pulse, some remotes send it, some don't
         self.trailing_gap_duration = trailing_gap_duration # trailing space
-        self.__log(LogLevel.Minimal, "NEC protocol initialized")
-
-    def __log(self, min_log_level, message):
-        if min_log_level <= self.log_level:
-            print(message)
-
-    # Send AGC burst before transmission
-    def send_agc(self):
-        self.__log(LogLevel.Normal, "Sending AGC burst")
-        self.wave_generator.one(self.leading_pulse_duration)
-        self.wave_generator.zero(self.leading_gap_duration)
-
-    # Trailing pulse is just a burst with the duration of standard pulse.
-    def send_trailing_pulse(self):
-        self.__log(LogLevel.Normal, "Sending trailing pulse")
-        self.wave_generator.one(self.trailing_pulse_duration)
-        if self.trailing_gap_duration > 0:
-            self.wave_generator.zero(self.trailing_gap_duration)
-
-    # This function is processing IR code. Leaves room for possible manipulation
-    # of the code before processing it.
-    def process_code(self, ircode):
-        if (self.leading_pulse_duration > 0) or (self.leading_gap_duration > 0):
-            self.send_agc()
-        self.__log(LogLevel.Normal, "Sending data")
-        for i in ircode:
-            if i == "0":
-                self.zero()
-            elif i == "1":
-                self.one()
-            else:
-                self.__log(LogLevel.ErrorsOnly, "ERROR! Non-binary digit!")
-                return 1
-        if self.trailing_pulse_duration > 0:
-            self.send_trailing_pulse()
-        return 0
-
-    # Generate zero or one in NEC protocol
-    # Zero is represented by a pulse and a gap of the same length
-    def zero(self):
-        self.__log(LogLevel.Verbose, "ZERO")
-        self.wave_generator.one(self.zero_pulse_duration)
-        self.wave_generator.zero(self.zero_gap_duration)
-
-    # One is represented by a pulse and a gap three times longer than the pulse
-    def one(self):
-        self.__log(LogLevel.Verbose, "ONE")
-        self.wave_generator.one(self.one_pulse_duration)
-        self.wave_generator.zero(self.one_gap_duration)
+        # AGC burst before transmission
+        header = ()
+        if (leading_pulse_duration > 0) or (leading_gap_duration > 0):
+            header = ((MARK, leading_pulse_duration), (SPACE, leading_gap_duration))
+        # Trailing pulse is just a burst with the duration of standard pulse.
+        trailer = ()
+        if trailing_pulse_duration > 0:
+            trailer = ((MARK, trailing_pulse_duration),)
+            if trailing_gap_duration > 0:
+                trailer += ((SPACE, trailing_gap_duration),)
+        # Zero is represented by a pulse and a gap of the same length,
+        # one by a pulse and a gap three times longer than the pulse
+        spec = ProtocolSpec(
+            zero=((MARK, zero_pulse_duration), (SPACE, zero_gap_duration)),
+            one=((MARK, one_pulse_duration), (SPACE, one_gap_duration)),
+            header=header,
+            trailer=trailer,
+            frequency=frequency, # in Hz, 38000 per specification
+            duty_cycle=duty_cycle) # duty cycle of high state pulse
+        super().__init__(master, log_level, spec, max_pulses)
+        self._log(LogLevel.Minimal, "NEC protocol initialized")
 
 # RC-5 protocol class
 # Note: start bits are not implemented here due to inconsistency between manufacturers.
 # Simply provide them with the rest of the IR code.
-class RC5():
+class RC5(TableProtocol):
     def __init__(self,
                 master,
                 log_level = LogLevel.Minimal,
                 frequency=36000,
                 duty_cycle=0.33,
                 one_duration=889,
-                zero_duration=889):
-        self.master = master
-        self.log_level = log_level
-        self.wave_generator = Wave_generator(self)
-        self.frequency = frequency # in Hz, 36000 per specification
-        self.duty_cycle = duty_cycle # duty cycle of high state pulse
+                zero_duration=889,
+                max_pulses=MAX_PULSES):
         # Durations of high pulse and low "gap".
         # Technically, they both should be the same in the RC-5 protocol, but we can never expect
         # that any given TV will follow the protocol specification.
         self.one_duration = one_duration # in microseconds, 889 per specification
         self.zero_duration = zero_duration # in microseconds, 889 per specification
-        self.__log(LogLevel.Minimal, "RC-5 protocol initialized")
-
-    def __log(self, min_log_level, message):
-        if min_log_level <= self.log_level:
-            print(message)
-
-    # This function is processing IR code. Leaves room for possible manipulation
-    # of the code before processing it.
-    def process_code(self, ircode):
-        for i in ircode:
-            if i == "0":
-                self.zero()
-            elif i == "1":
-                self.one()
-            else:
-                self.__log(LogLevel.ErrorsOnly, "ERROR! Non-binary digit!")
-                return 1
-        return 0
-
-    # Generate zero or one in RC-5 protocol
-    # Zero is represented by pulse-then-low signal
-    def zero(self):
-        self.wave_generator.one(self.zero_duration)
-        self.wave_generator.zero(self.zero_duration)
-
-    # One is represented by low-then-pulse signal
-    def one(self):
-        self.wave_generator.zero(self.one_duration)
-        self.wave_generator.one(self.one_duration)
+        # Zero is represented by pulse-then-low signal, one by low-then-pulse signal
+        spec = ProtocolSpec(
+            zero=((MARK, zero_duration), (SPACE, zero_duration)),
+            one=((SPACE, one_duration), (MARK, one_duration)),
+            frequency=frequency, # in Hz, 36000 per specification
+            duty_cycle=duty_cycle) # duty cycle of high state pulse
+        super().__init__(master, log_level, spec, max_pulses)
+        self._log(LogLevel.Minimal, "RC-5 protocol initialized")
 
 # RAW IR ones and zeroes. Specify length for one and zero and simply bitbang the GPIO.
 # The default values are valid for one tested remote which didn't fit in NEC or RC-5 specifications.
 # It can also be used in case you don't want to bother with deciphering raw bytes from IR receiver:
 # i.e. instead of trying to figure out the protocol, simply define bit lengths and send them all here.
-class RAW():
+class RAW(TableProtocol):
     def __init__(self,
                 master, 
                 log_level = LogLevel.Minimal,
                 frequency=36000,
                 duty_cycle=0.33,
                 one_duration=520,
-                zero_duration=520):
-        self.master = master
-        self.log_level = log_level
-        self.wave_generator = Wave_generator(self)
-        self.frequency = frequency # in Hz
-        self.duty_cycle = duty_cycle # duty cycle of high state pulse
+                zero_duration=520,
+                max_pulses=MAX_PULSES):
         self.one_duration = one_duration # in microseconds
         self.zero_duration = zero_duration # in microseconds
-
-    def __log(self, min_log_level, message):
-        if min_log_level <= self.log_level:
-            print(message)
-
-    def process_code(self, ircode):
-        for i in ircode:
-            if i == "0":
-                self.zero()
-            elif i == "1":
-                self.one()
+        # Zero is represented by low (no signal) for a specified duration,
+        # one by pulse for a specified duration.
+        spec = ProtocolSpec(
+            zero=((SPACE, zero_duration),),
+            one=((MARK, one_duration),),
+            frequency=frequency, # in Hz
+            duty_cycle=duty_cycle) # duty cycle of high state pulse
+        super().__init__(master, log_level, spec, max_pulses)
+
+def data_to_code(data, maxMask, mustInvert):
+    """
+    Converts raw data into a binary IR code string.
+
+    Parameters:
+        data (list): The raw data to convert.
+        maxMask (int): The maximum mask value for bit extraction.
+        mustInvert (bool): Whether to invert the data (send least significant bits first).
+    """
+    code = []
+    for i in range(len(data)):
+        idx = i if mustInvert else (len(data) - i - 1)
+        mask = 1
+        while mask < maxMask and mask > 0:
+            if mustInvert:
+                code.append('1' if data[idx] & mask else '0')
             else:
-                self.__log(LogLevel.ErrorsOnly, "ERROR! Non-binary digit!")
-                return 1
-        return 0
+                code.insert(0, '1' if data[idx] & mask else '0')
+            mask <<= 1
+    return ''.join(code)
+
+PROTOCOLS = {
+    "NEC": NEC,
+    "RC-5": RC5,
+    "RAW": RAW
+}
+
+def create_protocol(protocol, master, log_level, protocol_config):
+    """Creates a protocol by name (see PROTOCOLS), or from a ProtocolSpec (protocol_config may set max_pulses)."""
+    if isinstance(protocol, ProtocolSpec):
+        return TableProtocol(master, log_level, protocol, **protocol_config)
+    return PROTOCOLS[protocol](master, log_level, **protocol_config)
+
+class CompiledWave:
+    """
+    Pulse train generated ahead of time by compile_code, sent with IrSender.send_compiled.
+    The GPIO pin is part of the pulses, so a wave is only valid for the pin it was compiled for.
+    """
+    def __init__(self, gpio_pin, pulses, pulse_count):
+        self.gpio_pin = gpio_pin
+        self.pulses = pulses
+        self.pulse_count = pulse_count
 
-    # Generate raw zero or one.
-    # Zero is represented by low (no signal) for a specified duration.
-    def zero(self):
-        self.wave_generator.zero(self.zero_duration)
+class _PinMaster:
+    """Stands in for IrSender when generating pulses, the protocols only need the GPIO pin."""
+    def __init__(self, gpio_pin):
+        self.gpio_pin = gpio_pin
 
-    # One is represented by pulse for a specified duration.
-    def one(self):
-        self.wave_generator.one(self.one_duration)
+def compile_code(gpio_pin, protocol, protocol_config, ircode, nb=1, log_level=LogLevel.ErrorsOnly):
+    """
+    Generates the pulses of an IR code without touching the GPIO.
+
+    Parameters:
+        gpio_pin (int): The GPIO pin the pulses will be sent on.
+        protocol (str|ProtocolSpec): The IR protocol (e.g., "NEC", "RC-5", "RAW") or its description.
+        protocol_config (dict): Configuration parameters for the chosen protocol.
+        ircode (str): The binary IR code.
+        nb (int): Number of times to repeat the code.
+
+    Returns:
+        CompiledWave: The pulses, in an array of exactly pulse_count entries.
+    """
+    generator = create_protocol(protocol, _PinMaster(gpio_pin), log_level, protocol_config)
+    try:
+        for _ in range(nb):
+            if generator.process_code(ircode) != 0:
+                raise ValueError("Invalid IR code")
+        count = generator.wave_generator.pulse_count
+        # Copy out of the pooled buffer, the compiled wave is kept for a long time
+        pulses = (Pulses_struct * count)()
+        ctypes.memmove(pulses, generator.wave_generator.pulses, ctypes.sizeof(pulses))
+        return CompiledWave(gpio_pin, pulses, count)
+    finally:
+        generator.wave_generator.release()
 
 class IrSender:
-    def __init__(self, gpio_pin, protocol, protocol_config, log_level=LogLevel.Minimal):
+    def __init__(self, gpio_pin, protocol, protocol_config, log_level=LogLevel.Minimal, pigpio=None):
         """
         Initializes the IR sender.
         
         Parameters:
             gpio_pin (int): The GPIO pin used for IR transmission.
-            protocol (str): The IR protocol (e.g., "NEC", "RC-5", "RAW").
+            protocol (str|ProtocolSpec): The IR protocol (e.g., "NEC", "RC-5", "RAW") or its description.
             protocol_config (dict): Configuration parameters for the chosen protocol.
             log_level (LogLevel): The verbosity level for logging.
+            pigpio: Object used instead of libpigpio.so, e.g. capture.CapturingPigpio.
         """
         self.log_level = log_level
         self.__log(LogLevel.Minimal, "Starting IR")
-        self.__log(LogLevel.Normal, "Loading libpigpio.so")
 
-        # Load the pigpio library
-        try:
-            self.pigpio = ctypes.CDLL('/usr/lib/libpigpio.so')
-        except OSError as e:
-            self.__log(LogLevel.ErrorsOnly, f"Failed to load libpigpio.so: {e}")
-            raise RuntimeError("Failed to load libpigpio.so")
+        if pigpio is not None:
+            self.pigpio = pigpio
+        else:
+            self.__log(LogLevel.Normal, "Loading libpigpio.so")
+            # Load the pigpio library
+            try:
+                self.pigpio = ctypes.CDLL('/usr/lib/libpigpio.so')
+            except OSError as e:
+                self.__log(LogLevel.ErrorsOnly, f"Failed to load libpigpio.so: {e}")
+                raise RuntimeError("Failed to load libpigpio.so")
         
         self.__log(LogLevel.Normal, "Initializing pigpio")
-        self.pigpio.gpioInitialise()
+        if self.pigpio.gpioInitialise() < 0:
+            self.__log(LogLevel.ErrorsOnly, "Failed to initialise pigpio")
+            raise RuntimeError("Failed to initialise pigpio (is another process using it?)")
 
         # Set up the GPIO pin for output
         self.gpio_pin = gpio_pin
@@ -265,15 +487,10 @@ class IrSender:
 
         # Initialize the IR protocol
         self.__log(LogLevel.Normal, "Initializing protocol")
-        if protocol == "NEC":
-            self.protocol = NEC(self, log_level, **protocol_config)
-        elif protocol == "RC-5":
-            self.protocol = RC5(self, log_level, **protocol_config)
-        elif protocol == "RAW":
-            self.protocol = RAW(self, log_level, **protocol_config)
-        else:
+        if not isinstance(protocol, ProtocolSpec) and protocol not in PROTOCOLS:
             self.__log(LogLevel.ErrorsOnly, "Protocol not specified! Exiting...")
             raise ValueError("Protocol not specified!")
+        self.protocol = create_protocol(protocol, self, log_level, protocol_config)
         
         self.__log(LogLevel.Minimal, "IR ready")
 
@@ -289,7 +506,17 @@ class IrSender:
         Parameters:
             ircode (str): The binary IR code to send.
             nb (int): Number of times to send the code.
+
+        Returns:
+            int: 1 on errors, None on success.
         """
+        try:
+            return self.__send_code(ircode, nb)
+        finally:
+            # pigpio has copied the pulses by now, return the array to the pool
+            self.protocol.wave_generator.release()
+
+    def __send_code(self, ircode, nb):
         self.__log(LogLevel.Normal, f"Processing IR code: {' '.join([ircode[i:i+8] for i in range(0, len(ircode), 8)])}")
         
         for _ in range(nb):
@@ -298,13 +525,30 @@ class IrSender:
                 self.__log(LogLevel.ErrorsOnly, "Error in processing IR code!")
                 return 1
 
+        return self.__send_wave(self.protocol.wave_generator.pulses, self.protocol.wave_generator.pulse_count)
+
+    def send_compiled(self, wave):
+        """
+        Sends a pulse train generated ahead of time by compile_code.
+        
+        Parameters:
+            wave (CompiledWave): The pulses to send, compiled for this GPIO pin.
+
+        Returns:
+            int: 1 on errors, None on success.
+        """
+        if wave.gpio_pin != self.gpio_pin:
+            raise ValueError(f"Pulses were compiled for GPIO {wave.gpio_pin}, not {self.gpio_pin}")
+        return self.__send_wave(wave.pulses, wave.pulse_count)
+
+    def __send_wave(self, pulse_array, pulse_count):
         # Clear existing waveform
         if self.pigpio.gpioWaveClear() != 0:
             self.__log(LogLevel.ErrorsOnly, "Error in clearing wave!")
             return 1
 
         # Add wave to pigpio
-        pulses = self.pigpio.gpioWaveAddGeneric(self.protocol.wave_generator.pulse_count, self.protocol.wave_generator.pulses)
+        pulses = self.pigpio.gpioWaveAddGeneric(pulse_count, pulse_array)
         if pulses < 0:
             self.__log(LogLevel.ErrorsOnly, "Error in adding wave!")
             return 1
@@ -346,17 +590,5 @@ class IrSender:
         self.__log(LogLevel.Minimal, f"Sending {'inverted ' if mustInvert else ''}data:")
         self.__log(LogLevel.Minimal, (' '.join('{:x}'.format(d) for d in data)).upper())
         
-        # Convert raw data to IR code
-        code = []
-        for i in range(len(data)):
-            idx = i if mustInvert else (len(data) - i - 1)
-            mask = 1
-            while mask < maxMask and mask > 0:
-                if mustInvert:
-                    code.append('1' if data[idx] & mask else '0')
-                else:
-                    code.insert(0, '1' if data[idx] & mask else '0')
-                mask <<= 1
-        
         # Send the processed IR code
-        self.send_code(''.join(code), nb)
+        return self.send_code(data_to_code(data, maxMask, mustInvert), nb)
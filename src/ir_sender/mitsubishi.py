@@ -1,5 +1,4 @@
 from . import ir_sender
-import pigpio
 from datetime import datetime
 
 class PowerMode:
@@ -149,13 +148,59 @@ class Constants:
     NbBytes = 18
     NbPackets = 2           # For Mitsubishi IR protocol we have to send two time the packet data
 
+def clock_value(time):
+    """
+    clock_value: Encodes a time of day in ten-minute steps (For Clock, StartTime and EndTime)
+    """
+    return (time.hour*6) + (time.minute//10)
+
+def encode_frame(climate_mode, temperature, fan_mode, vanne_vertical_mode, vanne_horizontal_mode, isee_mode, area_mode, start_time, end_time, powerful, power_mode, now):
+    """
+    encode_frame: Builds the 18 bytes Mitsubishi frame for the given settings
+    """
+    # data array is a valid trame, only byte to be chnaged will be updated.
+    data = [0x23, 0xCB, 0x26, 0x01, 0x00, 0x20,
+            0x08, 0x06, 0x30, 0x45, 0x67, 0x00,
+            0x00, 0x00, 0x10, 0x00, 0x00, 0x1F]
+
+    data[Index.Power] = power_mode
+    data[Index.ClimateAndISee] = climate_mode | isee_mode
+    data[Index.Temperature] = max(Constants.MinTemp, min(Constants.MaxTemp, temperature)) - 16
+    data[Index.ClimateAndHorizontalVanne] = ClimateMode.climate2(climate_mode) | vanne_horizontal_mode
+    data[Index.FanAndVerticalVanne] = fan_mode | vanne_vertical_mode
+    data[Index.Clock] = clock_value(now)
+    data[Index.EndTime] = 0 if end_time is None else clock_value(end_time)
+    data[Index.StartTime] = 0 if start_time is None else clock_value(start_time)
+
+    time_control = TimeControlMode.NoTimeControl
+    if end_time is not None and start_time is not None:
+        time_control = TimeControlMode.ControlBoth
+    elif end_time is not None:
+        time_control = TimeControlMode.ControlEnd
+    elif start_time is not None:
+        time_control = TimeControlMode.ControlStart
+    data[Index.TimeControlAndArea] = time_control | area_mode
+
+    data[Index.PowerfulMode] = powerful
+
+    # CRC is a simple bits addition
+    # sum every bytes but the last one
+    data[Index.CRC] = sum(data[:-1]) % (Constants.MaxMask + 1)
+    return data
+
 class Mitsubishi:
     """
     Mitsubishi
     """
-    def __init__(self, gpio_pin, log_level=ir_sender.LogLevel.Minimal):
+    def __init__(self, gpio_pin, log_level=ir_sender.LogLevel.Minimal, frame_table=None, pigpio=None, clock=None):
         self.log_level = log_level
         self.gpio_pin = gpio_pin
+        # Optional precomputed FrameTable (see frame_table.py)
+        self.frame_table = frame_table
+        # Optional stand-in for libpigpio.so (see capture.py)
+        self.pigpio = pigpio
+        # Returns the time sent in the Clock byte
+        self.clock = clock or datetime.today
 
     def power_off(self):
         """
@@ -201,13 +246,57 @@ class Mitsubishi:
             powerful,
             PowerMode.PowerOn)
 
-    def __log(self, min_log_level, message):
-        if min_log_level <= self.log_level:
-            print(message)
+    def compile_command(self,
+                        climate_mode=ClimateMode.Auto,
+                        temperature=21,
+                        fan_mode=FanMode.Auto,
+                        vanne_vertical_mode=VanneVerticalMode.Auto,
+                        vanne_horizontal_mode=VanneHorizontalMode.NotSet,
+                        isee_mode=ISeeMode.ISeeOff,
+                        area_mode=AreaMode.NotSet,
+                        powerful=PowerfulMode.PowerfulOff,
+                        power_mode=PowerMode.PowerOn,
+                        now=None):
+        """
+        compile_command: Generates the pulses of a command ahead of time, to be sent with send_compiled
 
-    def __send_command(self, climate_mode, temperature, fan_mode, vanne_vertical_mode, vanne_horizontal_mode, isee_mode, area_mode, start_time, end_time, powerful, power_mode):
+        The frame carries the clock of now (default: the current time), so the
+        result is only up to date within the same ten-minute Clock slot.
+        """
+        if now is None:
+            now = self.clock()
+        data = self.__frame(climate_mode, temperature, fan_mode, vanne_vertical_mode, vanne_horizontal_mode, isee_mode, area_mode, None, None, powerful, power_mode, now)
+        return ir_sender.compile_code(self.gpio_pin, "NEC", Mitsubishi.protocol_config(),
+                                      ir_sender.data_to_code(data, Constants.MaxMask, True), Constants.NbPackets)
+
+    def compile_power_off(self, now=None):
+        """
+        compile_power_off: Generates the pulses of power_off ahead of time
+        """
+        return self.compile_command(vanne_horizontal_mode=VanneHorizontalMode.Swing, power_mode=PowerMode.PowerOff, now=now)
+
+    def send_compiled(self, wave):
+        """
+        send_compiled: Sends pulses generated by compile_command
+        """
+        sender = ir_sender.IrSender(self.gpio_pin, "NEC", Mitsubishi.protocol_config(), self.log_level, self.pigpio)
+        if sender.send_compiled(wave):
+            raise RuntimeError("IR transmission failed")
+
+    @staticmethod
+    def mark_time():
+        """
+        mark_time: Seconds the IR LED is driven (carrier on) by one command
+        """
+        bits = Constants.NbBytes * 8
+        return Constants.NbPackets * (Delay.HdrMark + bits * Delay.BitMark + Delay.RptMark) / 1000000.0
 
-        sender = ir_sender.IrSender(self.gpio_pin, "NEC", dict(
+    @staticmethod
+    def protocol_config():
+        """
+        protocol_config: NEC protocol parameters of the Mitsubishi IR protocol
+        """
+        return dict(
             leading_pulse_duration=Delay.HdrMark,
             leading_gap_duration=Delay.HdrSpace,
             one_pulse_duration=Delay.BitMark,
@@ -215,69 +304,56 @@ class Mitsubishi:
             zero_pulse_duration=Delay.BitMark,
             zero_gap_duration=Delay.ZeroSpace,
             trailing_pulse_duration=Delay.RptMark,
-            trailing_gap_duration=Delay.RptSpace), self.log_level)
+            trailing_gap_duration=Delay.RptSpace,
+            max_pulses=Mitsubishi.max_pulses())
 
-        # data array is a valid trame, only byte to be chnaged will be updated.
-        data = [0x23, 0xCB, 0x26, 0x01, 0x00, 0x20,
-                0x08, 0x06, 0x30, 0x45, 0x67, 0x00,
-                0x00, 0x00, 0x10, 0x00, 0x00, 0x1F]
+    @staticmethod
+    def max_pulses():
+        """
+        max_pulses: Number of pigpio pulses in one command, used to size the pulse buffers
+        """
+        period = 1000000.0 / Constants.Frequency
+        def mark(duration):
+            return int(round(duration / period)) * 2
+        bits = Constants.NbBytes * 8
+        # Every mark is followed by one space pulse
+        packet = (mark(Delay.HdrMark) + 1) + bits * (mark(Delay.BitMark) + 1) + (mark(Delay.RptMark) + 1)
+        return Constants.NbPackets * packet
+
+    def __log(self, min_log_level, message):
+        if min_log_level <= self.log_level:
+            print(message)
+
+    def __send_command(self, climate_mode, temperature, fan_mode, vanne_vertical_mode, vanne_horizontal_mode, isee_mode, area_mode, start_time, end_time, powerful, power_mode):
 
+        sender = ir_sender.IrSender(self.gpio_pin, "NEC", Mitsubishi.protocol_config(), self.log_level, self.pigpio)
+
+        now = self.clock()
+        data = self.__frame(climate_mode, temperature, fan_mode, vanne_vertical_mode, vanne_horizontal_mode, isee_mode, area_mode, start_time, end_time, powerful, power_mode, now)
+
+        if self.log_level >= ir_sender.LogLevel.Verbose:
+            self.__log_frame(data, temperature, now, start_time, end_time)
+
+        if sender.send_data(data, Constants.MaxMask, True, Constants.NbPackets):
+            raise RuntimeError("IR transmission failed")
+
+    def __frame(self, climate_mode, temperature, fan_mode, vanne_vertical_mode, vanne_horizontal_mode, isee_mode, area_mode, start_time, end_time, powerful, power_mode, now):
+        if self.frame_table is not None and start_time is None and end_time is None:
+            # Precomputed frame, only the clock and CRC bytes are patched in
+            return self.frame_table.lookup(now, climate_mode, temperature, fan_mode, vanne_vertical_mode, vanne_horizontal_mode, isee_mode, area_mode, powerful, power_mode)
+        return encode_frame(climate_mode, temperature, fan_mode, vanne_vertical_mode, vanne_horizontal_mode, isee_mode, area_mode, start_time, end_time, powerful, power_mode, now)
+
+    def __log_frame(self, data, temperature, now, start_time, end_time):
         self.__log(ir_sender.LogLevel.Verbose, '')
-        data[Index.Power] = power_mode
         self.__log(ir_sender.LogLevel.Verbose, 'PWR: {0:03d}  {0:02x}  {0:08b}'.format(data[Index.Power]))
-        self.__log(ir_sender.LogLevel.Verbose, '')
-        data[Index.ClimateAndISee] = climate_mode | isee_mode
-        self.__log(ir_sender.LogLevel.Verbose, 'CLI: {0:03d}  {0:02x}  {0:08b}'.format(climate_mode))
-        self.__log(ir_sender.LogLevel.Verbose, 'SEE: {0:03d}  {0:02x}  {0:08b}'.format(isee_mode))
         self.__log(ir_sender.LogLevel.Verbose, 'CLS: {0:03d}  {0:02x}  {0:08b}'.format(data[Index.ClimateAndISee]))
-        self.__log(ir_sender.LogLevel.Verbose, '')
-        data[Index.Temperature] = max(Constants.MinTemp, min(Constants.MaxTemp, temperature)) - 16
         self.__log(ir_sender.LogLevel.Verbose, 'TMP: {0:03d}  {0:02x}  {0:08b} (asked: {1})'.format(data[Index.Temperature], temperature))
-        self.__log(ir_sender.LogLevel.Verbose, '')
-        data[Index.ClimateAndHorizontalVanne] = ClimateMode.climate2(climate_mode) | vanne_horizontal_mode
-        self.__log(ir_sender.LogLevel.Verbose, 'CLI: {0:03d}  {0:02x}  {0:08b}'.format(ClimateMode.climate2(climate_mode)))
-        self.__log(ir_sender.LogLevel.Verbose, 'HOR: {0:03d}  {0:02x}  {0:08b}'.format(vanne_horizontal_mode))
         self.__log(ir_sender.LogLevel.Verbose, 'CLH: {0:03d}  {0:02x}  {0:08b}'.format(data[Index.ClimateAndHorizontalVanne]))
-        self.__log(ir_sender.LogLevel.Verbose, '')
-        data[Index.FanAndVerticalVanne] = fan_mode | vanne_vertical_mode
         self.__log(ir_sender.LogLevel.Verbose, 'FAN: {0:03d}  {0:02x}  {0:08b}'.format(data[Index.FanAndVerticalVanne]))
-        self.__log(ir_sender.LogLevel.Verbose, '')
-
-        now = datetime.today()
-        data[Index.Clock] = (now.hour*6) + (now.minute//10)
         self.__log(ir_sender.LogLevel.Verbose, 'CLK: {0:03d}  {0:02x}  {0:08b} {1}'.format(data[Index.Clock], now))
-        self.__log(ir_sender.LogLevel.Verbose, '')
-
-        data[Index.EndTime] = 0 if end_time is None else ((end_time.hour*6) + (end_time.minute//10))
         self.__log(ir_sender.LogLevel.Verbose, 'ETI: {0:03d}  {0:02x}  {0:08b} {1}'.format(data[Index.EndTime], end_time))
-        self.__log(ir_sender.LogLevel.Verbose, '')
-        data[Index.StartTime] = 0 if start_time is None else ((start_time.hour*6) + (start_time.minute//10))
         self.__log(ir_sender.LogLevel.Verbose, 'STI: {0:03d}  {0:02x}  {0:08b} {1}'.format(data[Index.StartTime], start_time))
-        self.__log(ir_sender.LogLevel.Verbose, '')
-
-        time_control = TimeControlMode.NoTimeControl
-        if end_time is not None and start_time is not None:
-            time_control = TimeControlMode.ControlBoth
-        elif end_time is not None:
-            time_control = TimeControlMode.ControlEnd
-        elif start_time is not None:
-            time_control = TimeControlMode.ControlStart
-        else:
-            time_control = TimeControlMode.NoTimeControl
-        data[Index.TimeControlAndArea] = time_control | area_mode 
-        self.__log(ir_sender.LogLevel.Verbose, 'TIC: {0:03d}  {0:02x}  {0:08b}'.format(time_control))
-        self.__log(ir_sender.LogLevel.Verbose, 'AEA: {0:03d}  {0:02x}  {0:08b}'.format(area_mode))
         self.__log(ir_sender.LogLevel.Verbose, 'TCA: {0:03d}  {0:02x}  {0:08b}'.format(data[Index.TimeControlAndArea]))
-        self.__log(ir_sender.LogLevel.Verbose, '')
-        
-        data[Index.PowerfulMode] = powerful
         self.__log(ir_sender.LogLevel.Verbose, 'FUL: {0:03d}  {0:02x}  {0:08b}'.format(data[Index.PowerfulMode]))
-        self.__log(ir_sender.LogLevel.Verbose, '')
-
-        # CRC is a simple bits addition
-        # sum every bytes but the last one
-        data[Index.CRC] = sum(data[:-1]) % (Constants.MaxMask + 1)
         self.__log(ir_sender.LogLevel.Verbose, 'CRC: {0:03d}  {0:02x}  {0:08b}'.format(data[Index.CRC]))
         self.__log(ir_sender.LogLevel.Verbose, '')
-
-        sender.send_data(data, Constants.MaxMask, True, Constants.NbPackets)
@@ -1,189 +1,134 @@
 import os
-import yaml
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from typing import Optional, Dict, Any, List
-from enum import Enum
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel
 from contextlib import asynccontextmanager
-from ir_sender.ir_sender import LogLevel
-from ir_sender.mitsubishi import (
-    Mitsubishi, ClimateMode, FanMode, VanneVerticalMode, VanneHorizontalMode,
-    ISeeMode, AreaMode, PowerfulMode
-)
+from ir_sender.mitsubishi import ClimateMode
 from sensors.temperature_sensor import TemperatureSensor
+from air_pump import (
+    AirPumpRequest, AirPumpController, RemoteAirPumpController, CommandPriorityEnum,
+    TransmitQueueFull, Priority, UnknownPreset, ThermalModelDisabled
+)
+from air_pump.config import load_config, restart_required_changes, DEFAULT_CONFIG_PATH
+from air_pump.config_watcher import start_watcher
+from air_pump.health import evaluate_readiness
+from air_pump.daemon import transmitter_socket_path, control_socket_path, start_server
+from air_pump.mqtt_bridge import start_bridge, stop_bridge
+from static_files import PrecompressedStaticFiles
+from profiler import RequestProfiler, DEFAULT_INTERVAL, MAX_SECONDS
 
-# Load configuration from file
-def load_config() -> Dict[str, Any]:
-    """Load configuration from YAML file."""
-    current_dir = os.path.dirname(__file__)
-    config_path = os.path.join(current_dir, "..", "config.yaml")
-    
-    try:
-        with open(config_path, 'r') as f:
-            return yaml.safe_load(f)
-    except Exception as e:
-        raise RuntimeError(f"Error loading configuration: {str(e)}")
+# Configuration and hardware are created on first use (or in lifespan) rather than
+# at import time, so that importing this module stays cheap and the server can
+# answer its first request as soon as possible after boot.
+_config = None
 
-config = load_config()
+def get_config() -> Dict[str, Any]:
+    """Return the loaded configuration, loading it on first call."""
+    global _config
+    if _config is None:
+        _config = load_config()
+    return _config
 
-# Configure temperature sensor
-temp_sensor_config = config.get("temperature_sensor", {})
-temperature_sensor = TemperatureSensor(
-    device_path=temp_sensor_config.get("device_path", "/sys/bus/w1/devices/28-00000a91e6ad"),
-    enabled=temp_sensor_config.get("enabled", True),
-    refresh_interval=temp_sensor_config.get("refresh_interval", 60)
-)
-# Store UI display preference
-temp_display_in_ui = temp_sensor_config.get("display_in_ui", True)
-
-# Define enums for cleaner API interfaces
-class FanSpeedEnum(str, Enum):
-    LOW = "low"
-    MED = "med"
-    HIGH = "high"
-    AUTO = "auto"
-
-class VerticalModeEnum(str, Enum):
-    AUTO = "auto"
-    TOP = "top"
-    MIDDLE_TOP = "middle_top"
-    MIDDLE = "middle"
-    MIDDLE_BOTTOM = "middle_bottom"
-    BOTTOM = "bottom"
-    SWING = "swing"
-
-class HorizontalModeEnum(str, Enum):
-    NOT_SET = "not_set"
-    LEFT = "left"
-    MIDDLE_LEFT = "middle_left"
-    MIDDLE = "middle"
-    MIDDLE_RIGHT = "middle_right"
-    RIGHT = "right"
-    SWING = "swing"
-
-# Define request and response models
-class AirPumpRequest(BaseModel):
-    temperature: int = Field(..., ge=16, le=31, description="Temperature setting (16-31°C)")
-    fan_speed: FanSpeedEnum = Field(FanSpeedEnum.AUTO, description="Fan speed setting")
-    vertical_mode: VerticalModeEnum = Field(VerticalModeEnum.MIDDLE, description="Vertical vane position")
-    horizontal_mode: HorizontalModeEnum = Field(HorizontalModeEnum.MIDDLE, description="Horizontal vane position")
-    
-    @validator('temperature')
-    def validate_temperature(cls, v):
-        if v < 16 or v > 31:
-            raise ValueError('Temperature must be between 16 and 31')
-        return v
-
-class AirPumpState(BaseModel):
-    power: bool = Field(False, description="Power state (on/off)")
-    mode: Optional[str] = Field(None, description="Current mode (cool/heat/off)")
-    temperature: Optional[int] = Field(None, description="Temperature setting (16-31°C)")
-    fan_speed: Optional[FanSpeedEnum] = Field(None, description="Fan speed setting")
-    vertical_mode: Optional[VerticalModeEnum] = Field(None, description="Vertical vane position")
-    horizontal_mode: Optional[HorizontalModeEnum] = Field(None, description="Horizontal vane position")
-    last_updated: Optional[str] = Field(None, description="Last updated timestamp")
+_temperature_sensor = None
+
+def get_temperature_sensor() -> TemperatureSensor:
+    """Return the temperature sensor, creating it on first call."""
+    global _temperature_sensor
+    if _temperature_sensor is None:
+        _temperature_sensor = TemperatureSensor.from_config(get_config().get("temperature_sensor", {}))
+    return _temperature_sensor
+
+def apply_config(config: Dict[str, Any]) -> None:
+    """
+    Switch the running app to a changed, already validated configuration.
+
+    The controller and sensor are updated in place, so the air pump state and
+    the initialised hardware are kept; CORS picks up the new settings on the
+    next request. Settings read only at startup are reported for a restart.
+    """
+    global _config
+    for name in restart_required_changes(get_config(), config):
+        print(f"Configuration change of {name} takes effect after a restart")
+    if _controller_instance is not None and config.get("transmitter", {}).get("mode", "local") != "daemon":
+        _controller_instance.reconfigure(config)
+    elif _temperature_sensor is not None:
+        _temperature_sensor.reconfigure(config.get("temperature_sensor", {}))
+    _config = config
+
+def temp_display_in_ui() -> bool:
+    """Whether the UI should display the room temperature."""
+    return get_config().get("temperature_sensor", {}).get("display_in_ui", True)
 
 class ApiResponse(BaseModel):
     status: str
     message: Optional[str] = None
     details: Optional[Dict[str, Any]] = None
 
-# Map enum values to IR sender constants
-FAN_SPEED_MAP = {
-    FanSpeedEnum.LOW: FanMode.Speed1,
-    FanSpeedEnum.MED: FanMode.Speed2,
-    FanSpeedEnum.HIGH: FanMode.Speed3,
-    FanSpeedEnum.AUTO: FanMode.Auto
-}
-
-VERTICAL_MODE_MAP = {
-    VerticalModeEnum.AUTO: VanneVerticalMode.Auto,
-    VerticalModeEnum.TOP: VanneVerticalMode.Top,
-    VerticalModeEnum.MIDDLE_TOP: VanneVerticalMode.MiddleTop,
-    VerticalModeEnum.MIDDLE: VanneVerticalMode.Middle,
-    VerticalModeEnum.MIDDLE_BOTTOM: VanneVerticalMode.MiddleBottom,
-    VerticalModeEnum.BOTTOM: VanneVerticalMode.Bottom,
-    VerticalModeEnum.SWING: VanneVerticalMode.Swing
-}
-
-HORIZONTAL_MODE_MAP = {
-    HorizontalModeEnum.NOT_SET: VanneHorizontalMode.NotSet,
-    HorizontalModeEnum.LEFT: VanneHorizontalMode.Left,
-    HorizontalModeEnum.MIDDLE_LEFT: VanneHorizontalMode.MiddleLeft,
-    HorizontalModeEnum.MIDDLE: VanneHorizontalMode.Middle,
-    HorizontalModeEnum.MIDDLE_RIGHT: VanneHorizontalMode.MiddleRight,
-    HorizontalModeEnum.RIGHT: VanneHorizontalMode.Right,
-    HorizontalModeEnum.SWING: VanneHorizontalMode.Swing
-}
-
-# Initialize Air Pump Controller as dependency
-class AirPumpController:
-    def __init__(self):
-        self.gpio_pin = config['gpio']['pin']
-        self.controller = Mitsubishi(self.gpio_pin, LogLevel.ErrorsOnly)
-        # Initialize state tracking
-        self._state = AirPumpState()
-        from datetime import datetime
-        self._state.last_updated = datetime.now().isoformat()
-    
-    def turn_off(self) -> None:
-        self.controller.power_off()
-        # Update state
-        self._state.power = False
-        self._state.mode = "off"
-        from datetime import datetime
-        self._state.last_updated = datetime.now().isoformat()
-    
-    def send_command(self, climate_mode, request: AirPumpRequest) -> None:
-        self.controller.send_command(
-            climate_mode=climate_mode,
-            temperature=request.temperature,
-            fan_mode=FAN_SPEED_MAP[request.fan_speed],
-            vanne_vertical_mode=VERTICAL_MODE_MAP[request.vertical_mode],
-            vanne_horizontal_mode=HORIZONTAL_MODE_MAP[request.horizontal_mode],
-            isee_mode=ISeeMode.ISeeOff,
-            area_mode=AreaMode.Full,
-            powerful=PowerfulMode.PowerfulOff
-        )
-        
-        # Update state after sending command
-        self._state.power = True
-        self._state.mode = "cool" if climate_mode == ClimateMode.Cold else "heat"
-        self._state.temperature = request.temperature
-        self._state.fan_speed = request.fan_speed
-        self._state.vertical_mode = request.vertical_mode
-        self._state.horizontal_mode = request.horizontal_mode
-        from datetime import datetime
-        self._state.last_updated = datetime.now().isoformat()
-    
-    def get_state(self) -> AirPumpState:
-        return self._state
-
-    def get_room_temperature(self) -> float:
-        """Get the current room temperature from the sensor"""
-        return temperature_sensor.read_temperature()
-
 # Singleton instance of the controller to maintain state across requests
 _controller_instance = None
 
 # Dependency for AirPumpController
 def get_controller():
+    """
+    Return the controller for this process.
+
+    With `transmitter.mode: daemon` the hardware and state are owned by the
+    transmitter daemon (python -m air_pump) and this process only forwards
+    commands to it, so uvicorn can run several workers.
+    """
     global _controller_instance
     if _controller_instance is None:
-        _controller_instance = AirPumpController()
+        config = get_config()
+        if config.get("transmitter", {}).get("mode", "local") == "daemon":
+            _controller_instance = RemoteAirPumpController(transmitter_socket_path(config))
+        else:
+            _controller_instance = AirPumpController.from_config(config, get_temperature_sensor())
     return _controller_instance
 
+# Callers mark their commands with this header; automation yields to users
+def get_command_priority(
+    x_command_priority: CommandPriorityEnum = Header(CommandPriorityEnum.USER)
+) -> Priority:
+    return Priority[x_command_priority.name]
+
+def queue_full_error(e: TransmitQueueFull) -> HTTPException:
+    """Map a transmit queue rejection to 429 Too Many Requests."""
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
 # Set up lifespan events
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup logic
     print("Starting Mitsubishi ILP IR Control API...")
+    # Fail fast on a broken config file; hardware is still initialised lazily.
+    config = get_config()
+    # In local mode this process owns the controller, so it also serves the local
+    # control socket used by scripts and `python -m ilpctl` and the MQTT bridge.
+    # In daemon mode the transmitter daemon serves them instead.
+    control_server = None
+    mqtt_bridge = None
+    config_watcher = start_watcher(config, DEFAULT_CONFIG_PATH, apply_config)
+    if config.get("transmitter", {}).get("mode", "local") != "daemon":
+        if config.get("control", {}).get("enabled", True):
+            try:
+                control_server = start_server(control_socket_path(config), get_controller())
+            except OSError as e:
+                print(f"Local control socket unavailable: {str(e)}")
+        mqtt_bridge = start_bridge(config, get_controller())
     yield
     # Shutdown logic
     print("Shutting down Mitsubishi ILP IR Control API...")
+    if config_watcher is not None:
+        config_watcher.stop()
+    if mqtt_bridge is not None:
+        stop_bridge(mqtt_bridge)
+    if control_server is not None:
+        control_server.shutdown()
+        control_server.server_close()
+    if _controller_instance is not None:
+        _controller_instance.close()
 
 # Create FastAPI app
 app = FastAPI(
@@ -194,21 +139,35 @@ app = FastAPI(
 )
 
 # Configure CORS
-cors_config = config.get("cors", {})
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=cors_config.get("allow_origins", ["*"]),
-    allow_origin_regex=cors_config.get("allow_origin_regex", None),
-    allow_methods=cors_config.get("allow_methods", ["*"]),
-    allow_headers=cors_config.get("allow_headers", ["*"]),
-    allow_credentials=True,
-)
+class ConfiguredCORSMiddleware:
+    """CORS middleware that reads its settings from config.yaml on first use and after reloads."""
+
+    def __init__(self, app):
+        self.app = app
+        self._cors = None
+        self._cors_config = None
+
+    async def __call__(self, scope, receive, send):
+        cors_config = get_config().get("cors", {})
+        if self._cors is None or cors_config is not self._cors_config:
+            self._cors_config = cors_config
+            self._cors = CORSMiddleware(
+                self.app,
+                allow_origins=cors_config.get("allow_origins", ["*"]),
+                allow_origin_regex=cors_config.get("allow_origin_regex", None),
+                allow_methods=cors_config.get("allow_methods", ["*"]),
+                allow_headers=cors_config.get("allow_headers", ["*"]),
+                allow_credentials=True,
+            )
+        await self._cors(scope, receive, send)
+
+app.add_middleware(ConfiguredCORSMiddleware)
 
 # Get path to the React build folder
 UI_BUILD_DIR = os.path.join(os.path.dirname(__file__), "react_ui", "build")
 
-# Mount the 'build' folder at the UI path
-app.mount("/ui", StaticFiles(directory=UI_BUILD_DIR, html=True), name="static")
+# Mount the 'build' folder at the UI path, serving precompressed variants of the assets
+app.mount("/ui", PrecompressedStaticFiles(directory=UI_BUILD_DIR, html=True, check_dir=False), name="static")
 
 # Root endpoint
 @app.get("/", response_model=ApiResponse, tags=["General"])
@@ -222,23 +181,26 @@ async def read_root():
 
 # Endpoint to turn off the air pump
 @app.post("/air_pump/off/", response_model=ApiResponse, tags=["Air Pump Control"])
-async def turn_off_air_pump(controller: AirPumpController = Depends(get_controller)):
+def turn_off_air_pump(controller: AirPumpController = Depends(get_controller)):
     """Turn off the air pump."""
     try:
         controller.turn_off()
         return ApiResponse(status="success", message="Air pump turned off")
+    except TransmitQueueFull as e:
+        raise queue_full_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to turn off air pump: {str(e)}")
 
 # Endpoint for cooling
 @app.post("/air_pump/cool/", response_model=ApiResponse, tags=["Air Pump Control"])
-async def cool_air_pump(
+def cool_air_pump(
     request: AirPumpRequest, 
-    controller: AirPumpController = Depends(get_controller)
+    controller: AirPumpController = Depends(get_controller),
+    priority: Priority = Depends(get_command_priority)
 ):
     """Send cooling command to the air pump."""
     try:
-        controller.send_command(ClimateMode.Cold, request)
+        controller.send_command(ClimateMode.Cold, request, priority)
         return ApiResponse(
             status="success", 
             message="Cooling command sent",
@@ -247,18 +209,21 @@ async def cool_air_pump(
                 "settings": request.dict()
             }
         )
+    except TransmitQueueFull as e:
+        raise queue_full_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to send cooling command: {str(e)}")
 
 # Endpoint for heating
 @app.post("/air_pump/heat/", response_model=ApiResponse, tags=["Air Pump Control"])
-async def heat_air_pump(
+def heat_air_pump(
     request: AirPumpRequest, 
-    controller: AirPumpController = Depends(get_controller)
+    controller: AirPumpController = Depends(get_controller),
+    priority: Priority = Depends(get_command_priority)
 ):
     """Send heating command to the air pump."""
     try:
-        controller.send_command(ClimateMode.Hot, request)
+        controller.send_command(ClimateMode.Hot, request, priority)
         return ApiResponse(
             status="success", 
             message="Heating command sent",
@@ -267,12 +232,49 @@ async def heat_air_pump(
                 "settings": request.dict()
             }
         )
+    except TransmitQueueFull as e:
+        raise queue_full_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to send heating command: {str(e)}")
 
+# Endpoint to list the presets from config.yaml
+@app.get("/air_pump/preset/", response_model=ApiResponse, tags=["Air Pump Control"])
+def list_presets(controller: AirPumpController = Depends(get_controller)):
+    """List the configured presets and the statistics of their precompiled IR signals."""
+    try:
+        return ApiResponse(
+            status="success",
+            message="Presets retrieved",
+            details=controller.get_presets()
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get presets: {str(e)}")
+
+# Endpoint to activate a preset
+@app.post("/air_pump/preset/{name}", response_model=ApiResponse, tags=["Air Pump Control"])
+def activate_preset(
+    name: str,
+    controller: AirPumpController = Depends(get_controller),
+    priority: Priority = Depends(get_command_priority)
+):
+    """Send a preset from config.yaml, using its IR signal compiled ahead of time."""
+    try:
+        controller.activate_preset(name, priority)
+        return ApiResponse(
+            status="success",
+            message=f"Preset {name} sent",
+            details={"preset": name}
+        )
+    except UnknownPreset as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except TransmitQueueFull as e:
+        raise queue_full_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to send preset: {str(e)}")
+
 # Endpoint to get the current state of the air pump
 @app.get("/air_pump/state/", response_model=ApiResponse, tags=["Air Pump Control"])
-async def get_air_pump_state(controller: AirPumpController = Depends(get_controller)):
+def get_air_pump_state(controller: AirPumpController = Depends(get_controller)):
     """Get the current state of the air pump."""
     try:
         state = controller.get_state()
@@ -284,9 +286,35 @@ async def get_air_pump_state(controller: AirPumpController = Depends(get_control
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get air pump state: {str(e)}")
 
+# Endpoint to get the transmit queue statistics
+@app.get("/air_pump/queue/", response_model=ApiResponse, tags=["Air Pump Monitoring"])
+def get_transmit_queue(controller: AirPumpController = Depends(get_controller)):
+    """Get the transmit queue depth, wait times and IR duty-cycle usage."""
+    try:
+        return ApiResponse(
+            status="success",
+            message="Transmit queue statistics retrieved",
+            details=controller.get_queue_stats()
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get transmit queue statistics: {str(e)}")
+
+# Endpoint to get the transmitter memory statistics
+@app.get("/air_pump/memory/", response_model=ApiResponse, tags=["Air Pump Monitoring"])
+def get_transmitter_memory(controller: AirPumpController = Depends(get_controller)):
+    """Get the transmitter process RSS and pulse buffer allocation statistics."""
+    try:
+        return ApiResponse(
+            status="success",
+            message="Transmitter memory statistics retrieved",
+            details=controller.get_memory_stats()
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get transmitter memory statistics: {str(e)}")
+
 # Add new endpoint for room temperature
 @app.get("/air_pump/room_temperature/", response_model=ApiResponse, tags=["Air Pump Monitoring"])
-async def get_room_temperature(controller: AirPumpController = Depends(get_controller)):
+def get_room_temperature(controller: AirPumpController = Depends(get_controller)):
     """Get the current room temperature."""
     try:
         temp = controller.get_room_temperature()
@@ -295,8 +323,8 @@ async def get_room_temperature(controller: AirPumpController = Depends(get_contr
                 status="error",
                 message="Temperature sensor reading failed",
                 details={
-                    "enabled": temperature_sensor.enabled,
-                    "display_in_ui": temp_display_in_ui
+                    "enabled": controller.sensor_enabled(),
+                    "display_in_ui": temp_display_in_ui()
                 }
             )
         
@@ -306,18 +334,107 @@ async def get_room_temperature(controller: AirPumpController = Depends(get_contr
             details={
                 "temperature": round(temp, 1),
                 "unit": "celsius",
-                "display_in_ui": temp_display_in_ui
+                "display_in_ui": temp_display_in_ui()
             }
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get room temperature: {str(e)}")
 
+# Endpoint for automations timing their commands
+@app.get("/air_pump/thermal_model/", response_model=ApiResponse, tags=["Air Pump Monitoring"])
+def get_thermal_prediction(
+    mode: Optional[str] = Query(None, description="heat or cool, defaults to the current mode"),
+    setpoint: Optional[int] = Query(None, ge=16, le=31, description="Target temperature, defaults to the current setting"),
+    controller: AirPumpController = Depends(get_controller)
+):
+    """Predict the minutes for the room to reach a setpoint, from how fast it has heated and cooled so far."""
+    try:
+        return ApiResponse(
+            status="success",
+            message="Time to setpoint predicted",
+            details=controller.get_thermal_prediction(mode, setpoint)
+        )
+    except ThermalModelDisabled as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to predict time to setpoint: {str(e)}")
+
 # Health check endpoint
 @app.get("/health", response_model=ApiResponse, tags=["General"])
 async def health_check():
     """Health check endpoint."""
     return ApiResponse(status="healthy")
 
+# Readiness endpoint for watchdogs, computed from counters without touching the hardware
+@app.get("/ready", response_model=ApiResponse, tags=["General"])
+def readiness_check(response: Response, controller: AirPumpController = Depends(get_controller)):
+    """Readiness check: 503 when transmissions or sensor readings keep failing or the queue is backed up."""
+    try:
+        health = controller.get_health()
+    except Exception as e:
+        response.status_code = 503
+        return ApiResponse(status="not_ready", message=f"Controller unavailable: {str(e)}")
+    reasons = evaluate_readiness(health, get_config().get("readiness", {}))
+    if reasons:
+        response.status_code = 503
+        return ApiResponse(status="not_ready", message="; ".join(reasons), details=health)
+    return ApiResponse(status="ready", details=health)
+
+# On-demand profiler; nothing is installed on the request path until a profile is started
+profiler = RequestProfiler(app, exclude_prefix="/admin/")
+
+def get_profiler() -> RequestProfiler:
+    """The profiler, when enabled in config.yaml"""
+    if not get_config().get("profiling", {}).get("enabled", False):
+        raise HTTPException(status_code=404, detail="Profiling is disabled in config.yaml")
+    return profiler
+
+# Endpoint to profile the next requests or a time window
+@app.post("/admin/profile/", response_model=ApiResponse, tags=["Admin"])
+def start_profile(
+    requests: Optional[int] = Query(None, ge=1, le=10000, description="Profile the next N requests"),
+    seconds: Optional[float] = Query(None, gt=0, le=MAX_SECONDS, description="Profile for this many seconds"),
+    request_profiler: RequestProfiler = Depends(get_profiler)
+):
+    """Start sampling the stacks of the next requests (at most 300 s) or of a time window."""
+    interval = get_config().get("profiling", {}).get("interval", DEFAULT_INTERVAL)
+    try:
+        request_profiler.start(requests, seconds, interval)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return ApiResponse(
+        status="success",
+        message="Profile started",
+        details=request_profiler.report()
+    )
+
+# Endpoint to end a profile early
+@app.delete("/admin/profile/", response_model=ApiResponse, tags=["Admin"])
+def stop_profile(request_profiler: RequestProfiler = Depends(get_profiler)):
+    """End the running profile, keeping its samples."""
+    request_profiler.stop()
+    return ApiResponse(status="success", message="Profile stopped", details=request_profiler.report())
+
+# Endpoint to get the time spent per stage
+@app.get("/admin/profile/", response_model=ApiResponse, tags=["Admin"])
+def get_profile(request_profiler: RequestProfiler = Depends(get_profiler)):
+    """Samples of the last profile per stage: api, frame, pulses, pigpio, transmit_wait, daemon, other."""
+    return ApiResponse(
+        status="success",
+        message=f"Profile {request_profiler.state}",
+        details=request_profiler.report()
+    )
+
+# Endpoint to get the collapsed stacks of the last profile
+@app.get("/admin/profile/collapsed", response_class=PlainTextResponse, tags=["Admin"])
+def get_profile_stacks(request_profiler: RequestProfiler = Depends(get_profiler)):
+    """Collapsed stacks of the last profile, rooted at their stage, for flamegraph.pl or speedscope."""
+    return request_profiler.collapsed()
+
 # Exception handlers
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
@@ -327,5 +444,8 @@ async def general_exception_handler(request, exc):
     )
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    # Auto-reload spawns a watcher process and re-imports everything on each change,
+    # so it is only enabled for development with --reload.
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload="--reload" in sys.argv[1:])
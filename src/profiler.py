@@ -0,0 +1,222 @@
+"""
+On-demand sampling profiler for the API, attributing time to the stages of a
+command.
+
+Nothing is installed until a profile is started: no middleware, no trace or
+profile hooks. A started profile samples the stacks of all threads with
+sys._current_frames() every `interval` seconds, from a thread of its own,
+and wraps the application for as long as it runs to count the requests. It
+ends after the next N requests or a time window, and the application is
+unwrapped again.
+
+Each sample is attributed to the innermost stage found on its stack:
+    pigpio          IrSender setup and __send_wave (pigpio calls and the airtime)
+    pulses          pulse expansion in ir_sender (Wave_generator, ProtocolEncoder)
+    frame           Mitsubishi frame building and the frame table
+    transmit_wait   request threads waiting for the transmit worker
+    daemon          waiting for the transmitter daemon (transmitter.mode: daemon)
+    api             FastAPI, Starlette, Pydantic and the endpoint code
+    other           anything else
+Threads waiting for work (leaf frame in threading, queue, selectors or
+socketserver) are counted as idle and left out.
+"""
+import os
+import queue
+import selectors
+import socketserver
+import sys
+import threading
+import time
+from collections import Counter
+from ir_sender import ir_sender, mitsubishi, frame_table
+from air_pump import controller, remote
+
+# Default seconds between two samples
+DEFAULT_INTERVAL = 0.005
+# Time limit of a profile of the next N requests
+MAX_SECONDS = 300
+# Frames kept per stack, from the leaf
+MAX_DEPTH = 128
+
+# Stages of single functions, matched before the stages of whole files
+STAGE_FUNCTIONS = {
+    ir_sender.IrSender.__init__.__code__: "pigpio",
+    ir_sender.IrSender._IrSender__send_wave.__code__: "pigpio",
+    controller.AirPumpController._transmit.__code__: "transmit_wait"
+}
+STAGE_FILES = {
+    ir_sender.__file__: "pulses",
+    mitsubishi.__file__: "frame",
+    frame_table.__file__: "frame",
+    remote.__file__: "daemon"
+}
+# Packages serving the requests, looked up when reporting so that the server
+# (uvicorn) is not imported here
+API_PACKAGES = ("fastapi", "starlette", "pydantic", "anyio", "uvicorn", "h11")
+# Files where a thread waiting for work has its leaf frame
+IDLE_FILES = {module.__file__ for module in (threading, queue, selectors, socketserver)}
+
+def frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+def api_dirs() -> tuple:
+    return tuple(
+        os.path.dirname(sys.modules[name].__file__) + os.sep
+        for name in API_PACKAGES if getattr(sys.modules.get(name), "__file__", None)
+    )
+
+def classify(stack, api_dirs) -> str:
+    """Stage of a stack of code objects, leaf first."""
+    for code in stack:
+        stage = STAGE_FUNCTIONS.get(code) or STAGE_FILES.get(code.co_filename)
+        if stage is not None:
+            return stage
+    if stack and stack[0].co_filename in IDLE_FILES:
+        return "idle"
+    if any(code.co_filename.startswith(api_dirs) for code in stack):
+        return "api"
+    return "other"
+
+class _CountingApp:
+    """ASGI wrapper counting the finished HTTP requests of a profile."""
+
+    def __init__(self, app, profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if scope["type"] == "http" and not scope["path"].startswith(self.profiler.exclude_prefix):
+                self.profiler._request_done()
+
+class RequestProfiler:
+    def __init__(self, app, exclude_prefix="/admin/"):
+        """
+        Args:
+            app (Starlette): Application whose requests are counted
+            exclude_prefix (str): Requests under this path are not counted (the profiler's own endpoints)
+        """
+        self.app = app
+        self.exclude_prefix = exclude_prefix
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._wrapper = None
+        self._reset(None, None, DEFAULT_INTERVAL)
+        self.state = "idle"
+
+    def _reset(self, requests, seconds, interval):
+        self.target_requests = requests
+        self.seconds = seconds
+        self.interval = interval
+        self.requests = 0
+        self.started = None
+        self.finished = None
+        # Stacks of code objects, leaf first -> samples
+        self._stacks = Counter()
+
+    def start(self, requests=None, seconds=None, interval=DEFAULT_INTERVAL):
+        """
+        Profile the next `requests` requests, or `seconds` seconds, whichever ends first
+
+        Raises:
+            ValueError: Neither requests nor seconds given
+            RuntimeError: A profile is already running
+        """
+        if requests is None and seconds is None:
+            raise ValueError("Give a number of requests or seconds to profile")
+        with self._lock:
+            if self.state == "running":
+                raise RuntimeError("A profile is already running")
+            self._reset(requests, seconds if seconds is not None else MAX_SECONDS, interval)
+            self.state = "running"
+            self.started = time.monotonic()
+            # A new event per profile, so a sampler that is still winding down cannot end this one
+            self._stopped = threading.Event()
+            if self.app.middleware_stack is None:
+                self.app.middleware_stack = self.app.build_middleware_stack()
+            self._wrapper = _CountingApp(self.app.middleware_stack, self)
+            self.app.middleware_stack = self._wrapper
+            self._thread = threading.Thread(target=self._run, args=(self._stopped, self._stacks), name="profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """End the running profile, keeping its samples for report() and collapsed()"""
+        self._finish(self._stopped)
+
+    def _finish(self, stopped):
+        with self._lock:
+            if self.state != "running" or stopped is not self._stopped:
+                return
+            self.state = "done"
+            self.finished = time.monotonic()
+            if self.app.middleware_stack is self._wrapper:
+                self.app.middleware_stack = self._wrapper.app
+            self._wrapper = None
+            self._stopped.set()
+
+    def _request_done(self):
+        self.requests += 1
+        if self.target_requests is not None and self.requests >= self.target_requests:
+            self.stop()
+
+    def _run(self, stopped, stacks):
+        me = threading.get_ident()
+        deadline = self.started + self.seconds
+        while not stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                stacks[tuple(stack)] += 1
+            if time.monotonic() >= deadline:
+                self._finish(stopped)
+
+    def report(self, top=5) -> dict:
+        """Samples per stage and the functions most often on top of the stack in each"""
+        stages = Counter()
+        leaves = {}
+        idle = 0
+        dirs = api_dirs()
+        for stack, samples in list(self._stacks.items()):
+            stage = classify(stack, dirs)
+            if stage == "idle":
+                idle += samples
+                continue
+            stages[stage] += samples
+            leaves.setdefault(stage, Counter())[frame_label(stack[0])] += samples
+        total = sum(stages.values())
+        end = self.finished if self.finished is not None else time.monotonic()
+        return {
+            "state": self.state,
+            "requests": self.requests,
+            "target_requests": self.target_requests,
+            "seconds": None if self.started is None else round(end - self.started, 3),
+            "interval": self.interval,
+            "samples": total,
+            "idle_samples": idle,
+            "stages": {
+                stage: {
+                    "samples": samples,
+                    "percent": round(100 * samples / total, 1),
+                    "milliseconds": round(samples * self.interval * 1000, 1),
+                    "top": [{"function": label, "samples": n} for label, n in leaves[stage].most_common(top)]
+                }
+                for stage, samples in stages.most_common()
+            }
+        }
+
+    def collapsed(self) -> str:
+        """Collapsed stacks (`stage;root;...;leaf count` lines) for flamegraph.pl or speedscope"""
+        lines = Counter()
+        dirs = api_dirs()
+        for stack, samples in list(self._stacks.items()):
+            stage = classify(stack, dirs)
+            if stage != "idle":
+                lines[";".join([stage] + [frame_label(code) for code in reversed(stack)])] += samples
+        return "".join(f"{line} {samples}\n" for line, samples in sorted(lines.items()))
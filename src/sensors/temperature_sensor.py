@@ -1,15 +1,28 @@
 import os
 import glob
 import time
-from datetime import datetime
+import subprocess
 import logging
+import threading
+from clock import SYSTEM_CLOCK
 
 logger = logging.getLogger(__name__)
 
+# DS18B20 conversion time in seconds per resolution in bits (from the datasheet)
+CONVERSION_TIME = {9: 0.094, 10: 0.188, 11: 0.375, 12: 0.750}
+
 class TemperatureSensor:
     """Temperature sensor using DS1820 1-wire sensor"""
+
+    # Resolutions used by the adaptive ("auto") resolution policy
+    LOW_RESOLUTION = 10
+    HIGH_RESOLUTION = 12
+    # Reads closer together than this (seconds) count as frequent sampling
+    FAST_SAMPLING_INTERVAL = 5
+    # A change between consecutive readings above this (°C) means the room is not stable
+    STABILITY_THRESHOLD = 0.5
     
-    def __init__(self, device_path, enabled=True, refresh_interval=60):
+    def __init__(self, device_path, enabled=True, refresh_interval=60, resolution="auto", clock=None):
         """Initialize the temperature sensor
         
         Args:
@@ -17,24 +30,66 @@ class TemperatureSensor:
             enabled (bool): Whether to enable temperature reading
             refresh_interval (int): How often to refresh the temperature data in seconds
                                    (0 means read on each request)
+            resolution (str|int): Conversion resolution in bits (9-12), "auto" to choose
+                                  it adaptively, or None to leave the sensor as it is
+            clock (SystemClock): Clock for the reading cache and sampling interval
         """
         self.device_path = device_path
+        self.clock = clock or SYSTEM_CLOCK
         self.enabled = enabled
         self.refresh_interval = refresh_interval
+        self.resolution = resolution
         self.last_reading = None
         self.last_reading_time = None
-        
-        if self.enabled:
-            self._load_kernel_modules()
+        self._modules_checked = False
+        # Open descriptor of the w1-therm `temperature` attribute, read with pread
+        self._temperature_fd = None
+        self._fast_path = None
+        self._current_resolution = None
+        # Set when the resolution cannot be written; self.resolution keeps the configured value
+        self._resolution_unsupported = False
+        self._previous_reading = None
+        # Guards the kept-open fd and the cache: the sensor is read from request
+        # threads, the MQTT bridge and the thermal model sampler
+        self._lock = threading.RLock()
+        # Health counters, read by the readiness check
+        self.readings = 0
+        self.failures = 0
+        self.failure_streak = 0
+
+    @classmethod
+    def from_config(cls, sensor_config, clock=None):
+        """Create a sensor from the `temperature_sensor` section of config.yaml"""
+        return cls(
+            device_path=sensor_config.get("device_path", "/sys/bus/w1/devices/28-00000a91e6ad"),
+            enabled=sensor_config.get("enabled", True),
+            refresh_interval=sensor_config.get("refresh_interval", 60),
+            resolution=sensor_config.get("resolution", "auto"),
+            clock=clock
+        )
     
+    # Kernel modules required by the 1-wire sensor, as named under /sys/module
+    KERNEL_MODULES = ('w1_gpio', 'w1_therm')
+
     def _load_kernel_modules(self):
-        """Load required kernel modules for 1-wire temperature sensors"""
-        try:
-            os.system('modprobe w1-gpio')
-            os.system('modprobe w1-therm')
-            logger.info("1-wire kernel modules loaded")
-        except Exception as e:
-            logger.error(f"Failed to load 1-wire kernel modules: {str(e)}")
+        """Load required kernel modules for 1-wire temperature sensors
+        
+        Module presence is checked through /sys/module so that, in the common case
+        where the modules are already loaded (e.g. via dtoverlay=w1-gpio), no
+        process is spawned at all.
+        """
+        self._modules_checked = True
+        if os.path.isdir(self.device_path):
+            return
+        for module in self.KERNEL_MODULES:
+            if os.path.isdir(f"/sys/module/{module}"):
+                continue
+            try:
+                subprocess.run(['modprobe', module.replace('_', '-')], check=True,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                logger.info(f"Kernel module {module} loaded")
+            except Exception as e:
+                logger.error(f"Failed to load kernel module {module}: {str(e)}")
     
     def read_temperature(self, force=False):
         """Read temperature from the sensor
@@ -48,15 +103,159 @@ class TemperatureSensor:
         if not self.enabled:
             logger.info("Temperature sensor is disabled")
             return None
-        
+        with self._lock:
+            return self._read_temperature(force)
+
+    def _read_temperature(self, force):
         # Return cached reading if available and not expired
         if not force and self.last_reading is not None and self.refresh_interval > 0:
-            time_since_last_reading = (datetime.now() - self.last_reading_time).total_seconds()
+            time_since_last_reading = (self.clock.now() - self.last_reading_time).total_seconds()
             if time_since_last_reading < self.refresh_interval:
                 logger.debug(f"Returning cached temperature: {self.last_reading}°C")
                 return self.last_reading
         
+        if not self._modules_checked:
+            self._load_kernel_modules()
+
         # Get a new reading
+        now = self.clock.now()
+        temp_c = None
+        if self._fast_path is not False:
+            temp_c = self._read_temperature_attribute(now)
+        if self._fast_path is False:
+            temp_c = self._read_w1_slave()
+        if temp_c is None:
+            self.failures += 1
+            self.failure_streak += 1
+            return None
+        self.readings += 1
+        self.failure_streak = 0
+
+        # Cache the reading
+        self._previous_reading = self.last_reading
+        self.last_reading = temp_c
+        self.last_reading_time = now
+
+        logger.debug(f"Temperature reading: {temp_c}°C")
+        return temp_c
+
+    def last_sample(self):
+        """The last reading and its time (datetime), (None, None) before the first"""
+        with self._lock:
+            return self.last_reading, self.last_reading_time
+
+    def reconfigure(self, sensor_config):
+        """Apply a changed `temperature_sensor` section of config.yaml
+        
+        The cached reading is kept unless the device path changed.
+        """
+        with self._lock:
+            device_path = sensor_config.get("device_path", self.device_path)
+            if device_path != self.device_path:
+                self.close()
+                self.device_path = device_path
+                self.last_reading = None
+                self.last_reading_time = None
+                self._previous_reading = None
+                self._modules_checked = False
+                self._fast_path = None
+                self._current_resolution = None
+                self._resolution_unsupported = False
+            self.enabled = sensor_config.get("enabled", True)
+            self.refresh_interval = sensor_config.get("refresh_interval", 60)
+            self.resolution = sensor_config.get("resolution", "auto")
+
+    def health(self):
+        """Reading counters and the age of the last sample, without touching the sensor
+        
+        Returns:
+            dict: enabled, readings, failures, failure_streak and sample_age_seconds
+                  (None before the first successful reading)
+        """
+        sample_age = None
+        if self.last_reading_time is not None:
+            sample_age = round((self.clock.now() - self.last_reading_time).total_seconds(), 3)
+        return {
+            "enabled": self.enabled,
+            "readings": self.readings,
+            "failures": self.failures,
+            "failure_streak": self.failure_streak,
+            "sample_age_seconds": sample_age
+        }
+
+    def close(self):
+        """Close the open sensor file descriptor"""
+        with self._lock:
+            if self._temperature_fd is not None:
+                os.close(self._temperature_fd)
+                self._temperature_fd = None
+
+    def _choose_resolution(self, now):
+        """Pick the conversion resolution for the next reading
+        
+        Frequent sampling and changing temperatures use a low resolution for a
+        short conversion; stable readings use the full 12-bit resolution.
+        """
+        if self._resolution_unsupported:
+            return None
+        if self.resolution != "auto":
+            return self.resolution
+        if self.last_reading_time is not None:
+            interval = (now - self.last_reading_time).total_seconds()
+            if interval < self.FAST_SAMPLING_INTERVAL:
+                return self.LOW_RESOLUTION
+        if self._previous_reading is not None and \
+                abs(self.last_reading - self._previous_reading) > self.STABILITY_THRESHOLD:
+            return self.LOW_RESOLUTION
+        return self.HIGH_RESOLUTION
+
+    def _set_resolution(self, bits):
+        """Write the conversion resolution to the w1-therm `resolution` attribute"""
+        if bits is None or bits == self._current_resolution:
+            return
+        try:
+            fd = os.open(f"{self.device_path}/resolution", os.O_WRONLY)
+            try:
+                os.write(fd, str(bits).encode())
+            finally:
+                os.close(fd)
+            self._current_resolution = bits
+            logger.debug(f"Sensor resolution set to {bits} bits")
+        except OSError as e:
+            # Older kernels or missing permissions: keep the sensor's resolution
+            logger.warning(f"Cannot set sensor resolution, using the sensor default: {str(e)}")
+            self._resolution_unsupported = True
+
+    def _read_temperature_attribute(self, now):
+        """Read the w1-therm `temperature` attribute (millidegrees) through a kept-open fd
+        
+        Returns:
+            float: Temperature in Celsius, or None if the reading fails. If the
+                   attribute does not exist, the w1_slave path is used from then on.
+        """
+        try:
+            if self._temperature_fd is None:
+                self._temperature_fd = os.open(f"{self.device_path}/temperature", os.O_RDONLY)
+                self._fast_path = True
+            self._set_resolution(self._choose_resolution(now))
+            raw = os.pread(self._temperature_fd, 16, 0)
+            return int(raw) / 1000.0
+        except FileNotFoundError:
+            if self._fast_path is None and os.path.isdir(self.device_path):
+                logger.info("Sensor has no temperature attribute, falling back to w1_slave")
+                self._fast_path = False
+            else:
+                logger.error(f"Temperature sensor not found at: {self.device_path}")
+            self.close()
+            return None
+        except Exception as e:
+            # The device may have gone away, reopen it on the next reading
+            logger.error(f"Error reading temperature: {str(e)}")
+            self.close()
+            return None
+
+    def _read_w1_slave(self):
+        """Read and parse the legacy w1_slave file (always a 12-bit conversion)"""
         try:
             # Find device file
             device_file = f"{self.device_path}/w1_slave"
@@ -70,14 +269,7 @@ class TemperatureSensor:
                 temp_pos = lines[1].find('t=')
                 if temp_pos != -1:
                     temp_string = lines[1][temp_pos + 2:]
-                    temp_c = float(temp_string) / 1000.0
-                    
-                    # Cache the reading
-                    self.last_reading = temp_c
-                    self.last_reading_time = datetime.now()
-                    
-                    logger.debug(f"Temperature reading: {temp_c}°C")
-                    return temp_c
+                    return float(temp_string) / 1000.0
             
             logger.warning("Invalid temperature reading")
             return None
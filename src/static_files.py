@@ -0,0 +1,91 @@
+import os
+from mimetypes import guess_type
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles, NotModifiedResponse
+
+# Content encodings in order of preference, with the suffix of their precompressed variant
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Hashed build assets never change under the same name, so they can be cached forever.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Unhashed files (index.html, manifest.json, ...) must be revalidated on every load.
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+def parse_accept_encoding(header: str) -> set:
+    """Return the set of content codings accepted by the client (q=0 excluded)."""
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding)
+    return accepted
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles serving build-time precompressed `.br`/`.gz` variants chosen by
+    the request's Accept-Encoding, with immutable caching for hashed assets.
+
+    Variants are generated by tools/precompress_ui.py. The lookup for each file
+    is done once and cached, since the build directory does not change while
+    the server is running.
+    """
+
+    def __init__(self, *args, immutable_prefixes=("static/",), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.immutable_prefixes = tuple(immutable_prefixes)
+        self._root = os.path.realpath(self.directory) if self.directory is not None else None
+        self._variants = {}
+
+    def _find_variants(self, full_path):
+        variants = self._variants.get(full_path)
+        if variants is None:
+            variants = []
+            for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+                try:
+                    variant_stat = os.stat(full_path + suffix)
+                except OSError:
+                    continue
+                variants.append((encoding, full_path + suffix, variant_stat))
+            self._variants[full_path] = variants
+        return variants
+
+    def cache_control(self, full_path) -> str:
+        """Return the Cache-Control header value for a file in the directory."""
+        relative_path = os.path.relpath(full_path, self._root).replace(os.sep, "/")
+        if relative_path.startswith(self.immutable_prefixes):
+            return IMMUTABLE_CACHE_CONTROL
+        return REVALIDATE_CACHE_CONTROL
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        headers = {"cache-control": self.cache_control(full_path)}
+        media_type = guess_type(full_path)[0] or "text/plain"
+        path = full_path
+
+        variants = self._find_variants(full_path)
+        if variants:
+            headers["vary"] = "Accept-Encoding"
+            accepted = parse_accept_encoding(request_headers.get("accept-encoding", ""))
+            for encoding, variant_path, variant_stat in variants:
+                if encoding in accepted:
+                    headers["content-encoding"] = encoding
+                    path, stat_result = variant_path, variant_stat
+                    break
+
+        response = FileResponse(path, status_code=status_code, headers=headers,
+                                media_type=media_type, stat_result=stat_result)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,175 @@
+"""
+Check of the MQTT bridge against a broker stand-in, without paho or a broker.
+
+FakeBroker implements the part of the paho client interface the bridge uses
+(on_connect/on_message, subscribe, publish) and records every publish. The
+controller transmits into CapturingPigpio and reads a fake sysfs sensor, so
+the checks cover:
+    - retained state and temperature published once, and again only on change
+    - the sensor read by the bridge at most every temperature_interval
+    - commands on the command topics reaching the controller
+    - everything published again after a reconnection
+
+Usage (from the src directory):
+    python tools/mqtt_check.py
+"""
+import json
+import logging
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from air_pump import AirPumpController, TransmitQueue
+from air_pump.mqtt_bridge import MqttBridge
+from clock import SystemClock
+from ir_sender.capture import CapturingPigpio
+from sensors.temperature_sensor import TemperatureSensor
+
+GPIO_PIN = 23
+PREFIX = "mitsubishi_ilp"
+
+
+class SteppedClock(SystemClock):
+    """Clock that only moves when advanced."""
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    def monotonic(self) -> float:
+        return self.seconds
+
+    def advance(self, seconds):
+        self.seconds += seconds
+
+
+class FakeBroker:
+    """Broker stand-in with the paho client interface, recording the publishes."""
+
+    def __init__(self):
+        self.on_connect = None
+        self.on_message = None
+        self.subscriptions = []
+        self.published = []
+
+    def subscribe(self, topic, qos=0):
+        self.subscriptions.append(topic)
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published.append((topic, payload, qos, retain))
+
+    def connect(self):
+        """Simulate the (re)connection of the client."""
+        self.on_connect(self, None, {}, 0)
+
+    def deliver(self, topic, payload):
+        """Simulate a message from the broker on a subscribed topic."""
+        self.on_message(self, None, SimpleNamespace(topic=topic, payload=payload))
+
+    def take(self) -> dict:
+        """Topic -> payload of the publishes since the last call."""
+        published = {topic: payload for topic, payload, _, _ in self.published}
+        self.published.clear()
+        return published
+
+
+def make_fake_device(root):
+    """Create a fake w1-therm device directory with the fast attributes."""
+    device_path = os.path.join(root, "28-000000000000")
+    os.makedirs(device_path)
+    set_temperature(device_path, 21.375)
+    with open(os.path.join(device_path, "resolution"), "w") as f:
+        f.write("12\n")
+    return device_path
+
+
+def set_temperature(device_path, celsius):
+    with open(os.path.join(device_path, "temperature"), "w") as f:
+        f.write(f"{round(celsius * 1000)}\n")
+
+
+def wait_for_commands(bridge):
+    # The command executor has a single worker, so this runs after the commands
+    bridge._executor.submit(lambda: None).result()
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as root:
+        device_path = make_fake_device(root)
+        # No sensor cache at all, the worst case for the bridge
+        sensor = TemperatureSensor(device_path, refresh_interval=0, resolution=12)
+        # Skip the kernel module check, there are no modules in the fake tree
+        sensor._modules_checked = True
+        pigpio = CapturingPigpio()
+        controller = AirPumpController(GPIO_PIN, sensor, TransmitQueue(), pigpio=pigpio)
+        broker = FakeBroker()
+        clock = SteppedClock()
+        bridge = MqttBridge(controller, broker, topic_prefix=PREFIX, temperature_interval=60, clock=clock)
+
+        broker.connect()
+        assert broker.subscriptions == [f"{PREFIX}/command/+"], broker.subscriptions
+        assert broker.take() == {f"{PREFIX}/availability": "online"}
+        print("connect: subscribed, availability online")
+
+        assert bridge.publish_changes() == 2
+        assert all(qos == 1 and retain for _, _, qos, retain in broker.published)
+        published = broker.take()
+        assert published[f"{PREFIX}/room_temperature"] == "21.4", published
+        assert bridge.publish_changes() == 0 and broker.take() == {}
+        print("publish: state and temperature published once, nothing when unchanged")
+
+        readings = sensor.readings
+        set_temperature(device_path, 22.0)
+        for _ in range(30):
+            clock.advance(1)
+            bridge.publish_changes()
+        assert sensor.readings == readings, sensor.readings - readings
+        assert broker.take() == {}
+        # A reading made by someone else is published from the cache
+        controller.get_room_temperature()
+        bridge.publish_changes()
+        assert broker.take() == {f"{PREFIX}/room_temperature": "22.0"}
+        set_temperature(device_path, 22.5)
+        for _ in range(29):
+            clock.advance(1)
+            bridge.publish_changes()
+        assert broker.take() == {}
+        assert sensor.readings == readings + 1, sensor.readings - readings
+        clock.advance(1)
+        bridge.publish_changes()
+        assert broker.take() == {f"{PREFIX}/room_temperature": "22.5"}
+        assert sensor.readings == readings + 2, sensor.readings - readings
+        print("temperature: sensor read once per temperature_interval, cached readings published")
+
+        broker.deliver(f"{PREFIX}/command/heat", json.dumps({"temperature": 22}).encode())
+        wait_for_commands(bridge)
+        assert bridge.publish_changes() == 1
+        state = json.loads(broker.take()[f"{PREFIX}/state"])
+        assert state["power"] and state["mode"] == "heat" and state["temperature"] == 22, state
+        frames = len(pigpio.waves)
+        broker.deliver(f"{PREFIX}/command/off", b"")
+        broker.deliver(f"{PREFIX}/command/cool", b"not json")
+        wait_for_commands(bridge)
+        assert len(pigpio.waves) == frames + 1, len(pigpio.waves) - frames
+        assert bridge.publish_changes() == 1
+        assert json.loads(broker.take()[f"{PREFIX}/state"])["power"] is False
+        print("commands: heat and off transmitted, invalid payload dropped")
+
+        broker.connect()
+        broker.take()
+        assert bridge.publish_changes() == 2
+        assert set(broker.take()) == {f"{PREFIX}/state", f"{PREFIX}/room_temperature"}
+        print("reconnect: everything published again")
+
+        bridge.stop()
+        assert broker.take() == {f"{PREFIX}/availability": "offline"}
+        sensor.close()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Precompress the React UI build for static serving.
+
+Writes `<file>.gz` (and `<file>.br` when the optional `brotli` package is
+installed) next to every compressible file in the build directory, so that
+the server can pick a variant by Accept-Encoding without compressing on the
+Pi's CPU. Variants that would save less than 10% are skipped.
+
+Usage (from the src directory):
+    python tools/precompress_ui.py [build_dir]
+"""
+import gzip
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_BUILD_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "react_ui", "build"))
+
+# Source maps are only fetched by developer tools, so they are left uncompressed.
+COMPRESSIBLE_EXTENSIONS = (".html", ".js", ".css", ".json", ".svg", ".txt")
+MIN_SIZE = 1024
+MAX_RATIO = 0.9
+
+
+def compressors():
+    """Return (suffix, compress function) pairs for the available encodings."""
+    result = [(".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        result.append((".br", lambda data: brotli.compress(data, quality=11)))
+    return result
+
+
+def precompress(build_dir):
+    """Write precompressed variants for the build directory, returning the number written."""
+    written = 0
+    for root, _, files in os.walk(build_dir):
+        for name in sorted(files):
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            if len(data) < MIN_SIZE:
+                continue
+            stat_result = os.stat(path)
+            for suffix, compress in compressors():
+                compressed = compress(data)
+                if len(compressed) > len(data) * MAX_RATIO:
+                    continue
+                with open(path + suffix, "wb") as f:
+                    f.write(compressed)
+                # Keep the original's mtime so the variant's validators follow the source
+                os.utime(path + suffix, (stat_result.st_atime, stat_result.st_mtime))
+                print(f"{os.path.relpath(path + suffix, build_dir)}: {len(data)} -> {len(compressed)} bytes")
+                written += 1
+    return written
+
+
+if __name__ == "__main__":
+    build_dir = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_BUILD_DIR
+    if brotli is None:
+        print("brotli not installed, writing gzip variants only")
+    precompress(build_dir)
@@ -0,0 +1,89 @@
+"""
+Steady-state memory check for the pulse buffer pool.
+
+Encodes thousands of Mitsubishi commands into pigpio pulse arrays the way the
+transmitter does (without touching the GPIO) and checks that the pulse buffers
+are reused and that the process RSS stays flat once warmed up.
+
+Usage (from the src directory):
+    python tools/pulse_pool_benchmark.py [--commands 5000] [--max-growth-kb 256]
+
+Exits with a non-zero status if buffers are allocated after warm-up, if a frame
+does not fit the worst-case buffer size, or if RSS grows by more than the limit.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ir_sender import ir_sender
+from ir_sender.mitsubishi import Mitsubishi, Constants, ClimateMode, encode_frame
+
+WARMUP_COMMANDS = 100
+
+
+class FakeMaster:
+    """Stands in for IrSender, the protocol only needs the GPIO pin."""
+    gpio_pin = 23
+
+
+def encode_command(temperature):
+    """Encode one command into a pooled pulse array and release it, returning the pulse count."""
+    protocol = ir_sender.NEC(
+        FakeMaster(), ir_sender.LogLevel.ErrorsOnly, **Mitsubishi.protocol_config())
+    data = encode_frame(ClimateMode.Hot, temperature, 0x80, 0x40, 0x00, 0x00, 0x00, None, None, 0x00, 0x20, datetime.today())
+    code = ir_sender.data_to_code(data, Constants.MaxMask, True)
+    try:
+        for _ in range(Constants.NbPackets):
+            protocol.process_code(code)
+        return protocol.wave_generator.pulse_count
+    finally:
+        protocol.wave_generator.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", type=int, default=5000, help="Number of commands to encode")
+    parser.add_argument("--max-growth-kb", type=int, default=256, help="Allowed RSS growth after warm-up")
+    args = parser.parse_args()
+
+    pool = ir_sender.get_pulse_pool(Mitsubishi.max_pulses())
+    for i in range(WARMUP_COMMANDS):
+        encode_command(Constants.MinTemp + i % 16)
+    before = ir_sender.memory_stats()["rss_bytes"]
+    allocations = pool.allocations
+
+    start = time.perf_counter()
+    max_count = 0
+    for i in range(args.commands):
+        max_count = max(max_count, encode_command(Constants.MinTemp + i % 16))
+    elapsed = time.perf_counter() - start
+    after = ir_sender.memory_stats()["rss_bytes"]
+
+    growth_kb = (after - before) / 1024
+    print(f"commands:          {args.commands} ({elapsed / args.commands * 1000:.2f} ms each)")
+    print(f"pulses per frame:  {max_count} (buffer capacity {pool.capacity}, pigpio maximum {ir_sender.MAX_PULSES})")
+    print(f"buffer size:       {pool.stats()['buffer_bytes']} bytes")
+    print(f"allocations:       {pool.allocations} total, {pool.allocations - allocations} after warm-up")
+    print(f"RSS:               {before / 1024:.0f} KB -> {after / 1024:.0f} KB ({growth_kb:+.0f} KB)")
+
+    failed = False
+    if max_count > pool.capacity:
+        print("FAIL: frame does not fit the buffer")
+        failed = True
+    if pool.allocations != allocations:
+        print("FAIL: pulse buffers allocated after warm-up")
+        failed = True
+    if growth_kb > args.max_growth_kb:
+        print(f"FAIL: RSS grew by more than {args.max_growth_kb} KB")
+        failed = True
+    if not failed:
+        print("OK: steady-state memory is flat")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+Time-warp replay of command and temperature traces through the API.
+
+Runs the real FastAPI app, AirPumpController, transmit queue and temperature
+sensor on a WarpClock, against a fake transmitter (pigpio stand-in that holds
+the LED for the airtime of each wave, in clock time) and a fake sysfs sensor,
+so a day of traffic replays in seconds.
+
+A trace is a JSON-lines file, `t` being the seconds since the start of the trace:
+    {"t": 0, "temperature": 21.5}
+    {"t": 30, "command": "heat 22 fan=high priority=automation"}
+    {"t": 31, "command": "state"}
+Commands use the plain-word form of the control protocol (see ilpctl) and are
+sent as the matching HTTP request (health as GET /ready). Without a trace
+file, a synthetic day is generated (temperature every minute, commands and
+polling from a UI).
+
+Usage (from the src directory):
+    python tools/replay.py [TRACE] [--speed 3600] [--concurrency 4] [--hours 24]
+
+Latencies are real time: transmissions are shortened by the speed factor,
+the Python overhead of each request is not.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote, urlencode
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.testclient import TestClient
+
+import main
+from air_pump import AirPumpController, TransmitQueue
+from air_pump.protocol import decode
+from clock import WarpClock
+from ir_sender.capture import CapturingPigpio
+from sensors.temperature_sensor import TemperatureSensor
+
+GPIO_PIN = 23
+
+
+class ReplayPigpio(CapturingPigpio):
+    """Counts the waves sent and keeps the LED busy for their airtime, without storing them."""
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+        self.frames = 0
+        self.airtime_us = 0
+
+    def gpioWaveCreate(self):
+        self._airtime = sum(delay for _, _, delay in self._pending)
+        self._pending = []
+        return 0
+
+    def gpioWaveTxSend(self, wave_id, mode):
+        self.frames += 1
+        self.airtime_us += self._airtime
+        self.clock.sleep(self._airtime / 1000000.0)
+        return 0
+
+
+def make_fake_device(root):
+    """Create a fake w1-therm device directory with the fast attributes."""
+    device_path = os.path.join(root, "28-000000000000")
+    os.makedirs(device_path)
+    with open(os.path.join(device_path, "resolution"), "w") as f:
+        f.write("12\n")
+    set_temperature(device_path, 21.0)
+    return device_path
+
+
+def set_temperature(device_path, temperature):
+    with open(os.path.join(device_path, "temperature"), "w") as f:
+        f.write(f"{int(round(temperature * 1000))}\n")
+
+
+def load_trace(path):
+    with open(path) as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    return sorted(events, key=lambda event: event["t"])
+
+
+def synthetic_trace(hours, seed=1):
+    """A day-like trace: temperature every minute, a command every ~10 minutes, UI polling every 5 s."""
+    rng = random.Random(seed)
+    duration = hours * 3600
+    events = []
+    for t in range(0, duration, 60):
+        events.append({"t": t, "temperature": 21 + 2 * math.sin(t / 86400 * 2 * math.pi) + rng.uniform(-0.2, 0.2)})
+    t = 0.0
+    while t < duration:
+        t += rng.expovariate(1 / 600)
+        if rng.random() < 0.1:
+            command = "off"
+        else:
+            mode = rng.choice(["heat", "cool"])
+            priority = rng.choice(["user", "automation"])
+            command = f"{mode} {rng.randint(16, 31)} fan={rng.choice(['auto', 'low', 'med', 'high'])} priority={priority}"
+        events.append({"t": t, "command": command})
+        # A burst of commands now and then, e.g. an automation fighting a user
+        if rng.random() < 0.05:
+            for i in range(rng.randint(5, 15)):
+                events.append({"t": t + i * 0.5, "command": f"heat {rng.randint(16, 31)} priority=automation"})
+    for t in range(0, duration, 5):
+        events.append({"t": t, "command": rng.choice(["state", "room_temperature"])})
+    return sorted(events, key=lambda event: event["t"])
+
+
+def to_http(command):
+    """Map a plain-word command to (name, method, path, json body, headers)."""
+    message = decode(command.encode())
+    op = message["op"]
+    if op == "send":
+        headers = {"X-Command-Priority": message["priority"]} if "priority" in message else {}
+        return message["mode"], "POST", f"/air_pump/{message['mode']}/", message["settings"], headers
+    if op == "off":
+        return "off", "POST", "/air_pump/off/", None, {}
+    if op == "preset":
+        headers = {"X-Command-Priority": message["priority"]} if "priority" in message else {}
+        return "preset", "POST", f"/air_pump/preset/{quote(message['name'])}", None, headers
+    if op == "presets":
+        return "presets", "GET", "/air_pump/preset/", None, {}
+    if op == "health":
+        return "health", "GET", "/ready", None, {}
+    if op == "thermal_model" and "mode" in message:
+        query = urlencode({"mode": message["mode"], "setpoint": message["setpoint"]})
+        return op, "GET", f"/air_pump/thermal_model/?{query}", None, {}
+    return op, "GET", f"/air_pump/{op}/", None, {}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main_replay():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", nargs="?", help="JSON-lines trace (default: synthetic)")
+    parser.add_argument("--speed", type=float, default=3600, help="Clock seconds per real second")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight at most")
+    parser.add_argument("--hours", type=int, default=24, help="Length of the synthetic trace")
+    parser.add_argument("--refresh-interval", type=int, default=60, help="Sensor cache lifetime in seconds")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    events = load_trace(args.trace) if args.trace else synthetic_trace(args.hours)
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    with tempfile.TemporaryDirectory() as root:
+        device_path = make_fake_device(root)
+        clock = WarpClock(args.speed, start)
+        sensor = TemperatureSensor(device_path, refresh_interval=args.refresh_interval, resolution=12, clock=clock)
+        # Skip the kernel module check, there are no modules in the fake tree
+        sensor._modules_checked = True
+        pigpio = ReplayPigpio(clock)
+        # The wait for the transmitter is bounded in clock time, but the Python
+        # overhead of the requests ahead is not shortened: allow it 10 real seconds
+        transmit_queue = TransmitQueue(wait_timeout=10 * args.speed, clock=clock)
+        controller = AirPumpController(GPIO_PIN, sensor, transmit_queue, clock=clock, pigpio=pigpio)
+        main.app.dependency_overrides[main.get_controller] = lambda: controller
+        client = TestClient(main.app)
+
+        latencies = defaultdict(list)
+        statuses = Counter()
+        lock = threading.Lock()
+        in_flight = threading.Semaphore(args.concurrency)
+
+        def run(name, method, path, body, headers):
+            try:
+                started = time.perf_counter()
+                response = client.request(method, path, json=body, headers=headers)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies[name].append(elapsed)
+                    statuses[response.status_code] += 1
+            finally:
+                in_flight.release()
+
+        max_lag = 0.0
+        real_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for event in events:
+                lag = clock.elapsed() - event["t"]
+                if lag < 0:
+                    clock.sleep(-lag)
+                max_lag = max(max_lag, lag)
+                if "temperature" in event:
+                    set_temperature(device_path, event["temperature"])
+                if "command" in event:
+                    in_flight.acquire()
+                    executor.submit(run, *to_http(event["command"]))
+        real_elapsed = time.perf_counter() - real_start
+        sensor.close()
+        main.app.dependency_overrides.pop(main.get_controller)
+
+    requests = sum(statuses.values())
+    queue = controller.get_queue_stats()
+    print(f"trace:        {len(events)} events over {events[-1]['t'] / 3600:.1f} h, replayed in {real_elapsed:.1f} s "
+          f"(x{args.speed:.0f}, max lag {max_lag:.1f} s of clock time)")
+    print(f"throughput:   {requests / real_elapsed:.1f} requests/s")
+    print(f"statuses:     {dict(sorted(statuses.items()))}")
+    print(f"IR frames:    {pigpio.frames} ({pigpio.airtime_us / 1000000:.1f} s of airtime), "
+          f"{queue['rejected']} rejected, {queue['evicted']} evicted, {queue['duty_cycle_delays']} duty-cycle delays")
+    print(f"  {'request':<17} {'count':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, values in sorted(latencies.items()):
+        print(f"  {name:<17} {len(values):>6} {percentile(values, 0.5) * 1000:>8.2f} {percentile(values, 0.9) * 1000:>8.2f} "
+              f"{percentile(values, 0.99) * 1000:>8.2f} {max(values) * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main_replay()
@@ -0,0 +1,75 @@
+"""
+Benchmark of the temperature sensor read paths against a fake sysfs tree.
+
+Compares the per-reading Python overhead of the fast path (kept-open
+`temperature` attribute read with pread) with the legacy `w1_slave` path.
+The fake tree has no conversion delay, so the DS18B20 conversion time per
+resolution is listed separately; on real hardware it dominates a reading.
+
+Usage (from the src directory):
+    python tools/sensor_benchmark.py [--readings 20000]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sensors.temperature_sensor import TemperatureSensor, CONVERSION_TIME
+
+W1_SLAVE = (
+    "56 01 4b 46 7f ff 0c 10 d3 : crc=d3 YES\n"
+    "56 01 4b 46 7f ff 0c 10 d3 t=21375\n"
+)
+
+
+def make_fake_device(root, fast):
+    """Create a fake w1-therm device directory, with or without the fast attributes."""
+    device_path = os.path.join(root, "28-000000000000")
+    os.makedirs(device_path)
+    with open(os.path.join(device_path, "w1_slave"), "w") as f:
+        f.write(W1_SLAVE)
+    if fast:
+        with open(os.path.join(device_path, "temperature"), "w") as f:
+            f.write("21375\n")
+        with open(os.path.join(device_path, "resolution"), "w") as f:
+            f.write("12\n")
+    return device_path
+
+
+def measure(device_path, readings):
+    """Return the mean seconds per forced reading."""
+    sensor = TemperatureSensor(device_path, refresh_interval=0, resolution=12)
+    # Skip the kernel module check, there are no modules in the fake tree
+    sensor._modules_checked = True
+    assert sensor.read_temperature(force=True) == 21.375
+    start = time.perf_counter()
+    for _ in range(readings):
+        sensor.read_temperature(force=True)
+    elapsed = time.perf_counter() - start
+    sensor.close()
+    return elapsed / readings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readings", type=int, default=20000, help="Number of readings per path")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as root:
+        fast = measure(make_fake_device(os.path.join(root, "fast"), True), args.readings)
+        legacy = measure(make_fake_device(os.path.join(root, "legacy"), False), args.readings)
+
+    print(f"temperature attribute (pread): {fast * 1e6:8.1f} us/reading")
+    print(f"w1_slave (open/readlines):     {legacy * 1e6:8.1f} us/reading")
+    print("DS18B20 conversion time per resolution:")
+    for bits, seconds in sorted(CONVERSION_TIME.items()):
+        print(f"  {bits} bits: {seconds * 1000:5.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
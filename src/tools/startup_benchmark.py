@@ -0,0 +1,89 @@
+"""
+Startup benchmark for the Mitsubishi ILP IR Control API.
+
+Measures, in fresh interpreters:
+  * import time of the `main` module
+  * time from spawning uvicorn until the first successful /health response
+
+Usage (from the src directory):
+    python tools/startup_benchmark.py [--runs 5] [--port 8765] [--target 6.0]
+
+The process exits with a non-zero status if the median time to first response
+exceeds the target. The default target is sized for a Raspberry Pi Zero W
+coming back after a power cut; use a tighter value on faster boards.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Median seconds from process spawn to first /health response on a Pi Zero W
+DEFAULT_TARGET_SECONDS = 6.0
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import main; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def measure_import():
+    """Return the time in seconds to import main in a fresh interpreter."""
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], cwd=SRC_DIR)
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def measure_first_response(port, timeout=60.0):
+    """Return the time in seconds from spawning uvicorn to the first /health response."""
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=SRC_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"No response from {url} within {timeout} seconds")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Number of measurements per metric")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the temporary server")
+    parser.add_argument("--target", type=float, default=DEFAULT_TARGET_SECONDS,
+                        help="Target median seconds to first response")
+    args = parser.parse_args()
+
+    import_times = [measure_import() for _ in range(args.runs)]
+    response_times = [measure_first_response(args.port) for _ in range(args.runs)]
+
+    print(f"import main:          median {statistics.median(import_times):.3f}s  "
+          f"min {min(import_times):.3f}s  max {max(import_times):.3f}s")
+    print(f"spawn to first reply: median {statistics.median(response_times):.3f}s  "
+          f"min {min(response_times):.3f}s  max {max(response_times):.3f}s")
+
+    median = statistics.median(response_times)
+    if median > args.target:
+        print(f"FAIL: median {median:.3f}s exceeds target {args.target:.3f}s")
+        return 1
+    print(f"OK: median {median:.3f}s within target {args.target:.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())